@@ -0,0 +1,67 @@
+"""Benchmark of get_company_company_link with the number of corporate PSCs"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from rama.processing.helper_functions import get_company_company_link
+from rama.processing.lists import company_kinds
+
+
+def make_database(n_corporate_pscs: int, seed: int = 0) -> tuple:
+    """Function to make a synthetic database with n_corporate_pscs company-company links"""
+    rng = np.random.default_rng(seed)
+    n_companies = 2 * n_corporate_pscs
+
+    company_numbers = np.char.zfill(np.arange(1, n_companies + 1).astype(str), 8)
+    company_names = np.char.add("company ", np.arange(n_companies).astype(str))
+    companies = pd.DataFrame({"company_number": company_numbers, "company_name": company_names})
+
+    owned = rng.integers(0, n_companies, n_corporate_pscs)
+    owners = rng.integers(0, n_companies, n_corporate_pscs)
+    psc = pd.DataFrame(
+        {
+            "company_number": company_numbers[owned],
+            "name": company_names[owners],
+            "kind": company_kinds[0],
+        }
+    )
+
+    n_humans = n_corporate_pscs // 2
+    first_companies = rng.choice(n_companies, n_humans, replace=False)
+    small_firstlink = pd.DataFrame(
+        {
+            "name": np.char.add("human ", np.arange(n_humans).astype(str)),
+            "company_name": company_names[first_companies],
+            "company_number": company_numbers[first_companies],
+            "idx_human": np.arange(1, n_humans + 1, dtype=float),
+            "idx_company": np.arange(n_humans + 1, 2 * n_humans + 1, dtype=float),
+        }
+    )
+
+    return psc, companies, small_firstlink
+
+
+def main() -> None:
+    """Time get_company_company_link for an increasing number of corporate PSCs"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'corporate PSCs':>15} {'seconds':>10} {'us per PSC':>12}")
+    for size in args.sizes:
+        psc, companies, small_firstlink = make_database(size)
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            get_company_company_link(psc, companies, small_firstlink, company_kinds)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        print(f"{size:>15} {best:>10.3f} {1e6 * best / size:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,15 @@
 
 # pylint: disable=unused-import
 from rama.processing.initialise_db import initialise, initialise_humans
+from rama.processing.storage import load_initialised, save_initialised
 from rama.processing.study_graphs import dict_edges, dict_nodes, get_dict_cluster
 
 
 __all__ = [
     "initialise",
     "initialise_humans",
+    "save_initialised",
+    "load_initialised",
     "dict_edges",
     "dict_nodes",
     "get_dict_cluster",
@@ -6,6 +6,7 @@ import numpy as np
 from tqdm import tqdm
 
 from rama.analysing.transfer_money import loss_function
+from rama.processing.node_attributes import get_node_attribute
 
 
 def make_profit_dict(profit_distribution, nodes_with_profit, nodes_without_profit):
@@ -141,7 +142,9 @@ def differential_evolution(
 
     # nx.set_node_attributes(subgraph, dict_incomes, "income")
 
-    nodes_with_profit = [node for node in subgraph.nodes() if not subgraph.nodes[node]["human"]]
+    nodes_with_profit = [
+        node for node in subgraph.nodes() if not get_node_attribute(subgraph, node, "human")
+    ]
 
     # initiate DE
     len_companies = len(nodes_with_profit)
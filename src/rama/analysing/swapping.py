@@ -6,10 +6,23 @@ from collections import deque
 import networkx as nx
 import numpy as np
 
+from rama.processing.node_attributes import get_nodes_attributes
+
 
 # Restrictions
 
 
+def get_in_degrees_and_humans(subgraph: nx.DiGraph) -> tuple:
+    """Function to get the current in degrees of the nodes of a subgraph and whether they are
+    humans, read as a vector from the node table"""
+    nodes_in_degrees = dict(subgraph.in_degree)
+    in_degrees = np.array(list(nodes_in_degrees.values()), dtype=np.int64)
+    humans = get_nodes_attributes(subgraph, list(nodes_in_degrees), ["human"]).human
+    humans = humans.to_numpy(dtype=bool)
+
+    return in_degrees, humans
+
+
 # First restriction
 def no_cycles(subgraph: nx.DiGraph) -> bool:
     """Function to check that a graph does not have cycles"""
@@ -29,30 +42,22 @@ def connected(subgraph: nx.DiGraph) -> bool:
 # Third restriction
 def no_more_than_two_per(subgraph: nx.DiGraph, limit: int = 2) -> bool:
     """Function to check that a company does not contain more than two human owners"""
-    indegrees = np.array(
-        [subgraph.in_degree(node) for node in subgraph.nodes if subgraph.nodes[node]["human"]]
-    )
-    return not any(indegrees > limit)
+    in_degrees, humans = get_in_degrees_and_humans(subgraph)
+    return not any(in_degrees[humans] > limit)
 
 
 # Fourth restriction
 def only_human_roots(subgraph: nx.DiGraph) -> bool:
     """Function to check that a graph only contains human roots"""
-    is_human = [
-        subgraph.nodes[node]
-        for node in subgraph.nodes
-        if subgraph.in_degree(node) == 0 and not subgraph.nodes[node]["human"]
-    ]
-    return len(is_human) == 0
+    in_degrees, humans = get_in_degrees_and_humans(subgraph)
+    return not any((in_degrees == 0) & ~humans)
 
 
 # Fifth restriction
 def no_slavery(subgraph: nx.DiGraph) -> bool:
     """Function to check that a human cannot own share of another human"""
-    degrees = sum(
-        subgraph.in_degree(node) for node in subgraph.nodes if subgraph.nodes[node]["human"]
-    )
-    return degrees == 0
+    in_degrees, humans = get_in_degrees_and_humans(subgraph)
+    return in_degrees[humans].sum() == 0
 
 
 # Alterations
@@ -2,6 +2,8 @@
 
 import networkx as nx
 
+from rama.processing.node_attributes import get_node_attribute
+
 
 dictionary_taxes = dict(
     zip(
@@ -64,7 +66,7 @@ def get_dividend_from_neighbours(graph, node, profits):
             wealth_neighbour *= graph.edges[(node, neighbour)]["weight"]
             wealth += wealth_neighbour
 
-    return taxes(wealth, human=graph.nodes[node]["human"])
+    return taxes(wealth, human=get_node_attribute(graph, node, "human"))
 
 
 def give_dividends(graph, node, profits):
@@ -104,7 +106,7 @@ def theoretical_wealth(graph, node, profits):
     in_hood = list(graph.predecessors(node))
     in_weights = sum(graph.edges[(neighbour, node)]["weight"] for neighbour in in_hood)
 
-    return (1 - in_weights) * taxes(wealth, human=graph.nodes[node]["human"])
+    return (1 - in_weights) * taxes(wealth, human=get_node_attribute(graph, node, "human"))
 
 
 def theoretical_wrapper(graph, profits):
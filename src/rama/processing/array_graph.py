@@ -0,0 +1,377 @@
+"""Array-backed directed graph functions"""
+
+from collections.abc import Mapping
+from typing import Iterator
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+
+csr_array_names = [
+    "node_ids",
+    "edge_sources",
+    "out_targets",
+    "out_offsets",
+    "in_edges",
+    "in_sources",
+    "in_offsets",
+]
+
+
+def get_python_value(value):
+    """Function to convert numpy scalars to the equivalent Python object.
+    Dates are converted to pd.Timestamp (pd.NaT if missing), as in the node table, and tuples,
+    the categories of list attributes loaded by load_initialised, back to lists."""
+    if isinstance(value, np.datetime64):
+        return pd.Timestamp(value)
+    if isinstance(value, tuple):
+        return list(value)
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class NodeAttributes(Mapping):
+    """Read-only view of the attributes of one node of an ArrayDiGraph"""
+
+    def __init__(self, graph: "ArrayDiGraph", position: int) -> None:
+        self._graph = graph
+        self._position = position
+
+    def __getitem__(self, name: str):
+        return get_python_value(self._graph.node_data[name][self._position])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._graph.node_data)
+
+    def __len__(self) -> int:
+        return len(self._graph.node_data)
+
+
+class EdgeAttributes(Mapping):
+    """Read-only view of the attributes of one edge of an ArrayDiGraph"""
+
+    def __init__(self, graph: "ArrayDiGraph", position: int) -> None:
+        self._graph = graph
+        self._position = position
+
+    def __getitem__(self, name: str):
+        return get_python_value(self._graph.edge_data[name][self._position])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._graph.edge_data)
+
+    def __len__(self) -> int:
+        return len(self._graph.edge_data)
+
+
+class NodeView:
+    """View of the nodes of an ArrayDiGraph, like graph.nodes in networkx"""
+
+    def __init__(self, graph: "ArrayDiGraph") -> None:
+        self._graph = graph
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._graph.node_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self._graph.node_ids)
+
+    def __contains__(self, node) -> bool:
+        return self._graph.has_node(node)
+
+    def __getitem__(self, node) -> NodeAttributes:
+        return NodeAttributes(self._graph, self._graph.get_position(node))
+
+    def __call__(self, data: bool = False) -> Iterator:
+        if not data:
+            return iter(self)
+        return (
+            (node, dict(NodeAttributes(self._graph, position)))
+            for position, node in enumerate(self._graph.node_ids.tolist())
+        )
+
+
+class EdgeView:
+    """View of the edges of an ArrayDiGraph, like graph.edges in networkx"""
+
+    def __init__(self, graph: "ArrayDiGraph") -> None:
+        self._graph = graph
+
+    def __iter__(self) -> Iterator[tuple]:
+        node_ids = self._graph.node_ids
+        return zip(
+            node_ids[self._graph.edge_sources].tolist(),
+            node_ids[self._graph.out_targets].tolist(),
+        )
+
+    def __len__(self) -> int:
+        return len(self._graph.out_targets)
+
+    def __contains__(self, edge: tuple) -> bool:
+        return self._graph.has_edge(*edge)
+
+    def __getitem__(self, edge: tuple) -> EdgeAttributes:
+        return EdgeAttributes(self._graph, self._graph.get_edge_position(*edge))
+
+    def __call__(self, data: bool = False) -> Iterator:
+        if not data:
+            return iter(self)
+        return (
+            (i, j, dict(EdgeAttributes(self._graph, position)))
+            for position, (i, j) in enumerate(self)
+        )
+
+
+class DegreeView:
+    """View of the in or out degrees of an ArrayDiGraph, like graph.in_degree in networkx"""
+
+    def __init__(self, graph: "ArrayDiGraph", offsets: np.ndarray) -> None:
+        self._graph = graph
+        self._degrees = np.diff(offsets)
+
+    def __iter__(self) -> Iterator[tuple]:
+        return zip(self._graph.node_ids.tolist(), self._degrees.tolist())
+
+    def __len__(self) -> int:
+        return len(self._degrees)
+
+    def __getitem__(self, node) -> int:
+        return int(self._degrees[self._graph.get_position(node)])
+
+    def __call__(self, node=None):
+        if node is None:
+            return self
+        return self[node]
+
+
+class ArrayDiGraph:
+    """Directed graph stored as arrays instead of dictionaries.
+    Nodes are kept sorted in node_ids and referred to by their position. The out edges are
+    stored in CSR form (out_offsets, out_targets) sorted by source and target, and the in edges
+    in CSC form (in_offsets, in_sources, in_edges), where in_edges gives the position of each in
+    edge in the CSR arrays. Node and edge attributes are arrays parallel to node_ids and
+    out_targets, in the node_data and edge_data dictionaries.
+    The graph is static and exposes the read-only part of the nx.DiGraph API used in rama."""
+
+    def __init__(self, node_ids: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> None:
+        """node_ids are the sorted unique node ids, sources and targets the positions
+        of the ends of every edge, already sorted by source and target and without repeats."""
+        n_nodes = len(node_ids)
+        self.node_ids = node_ids
+        self.edge_sources = sources
+        self.out_targets = targets
+        self.out_offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n_nodes), out=self.out_offsets[1:])
+
+        self.in_edges = np.argsort(targets, kind="stable")
+        self.in_sources = sources[self.in_edges]
+        self.in_offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n_nodes), out=self.in_offsets[1:])
+
+        self.node_data: dict[str, np.ndarray] = {}
+        self.edge_data: dict[str, np.ndarray] = {}
+        self.graph: dict = {}
+
+    @classmethod
+    def from_csr_arrays(cls, arrays: dict) -> "ArrayDiGraph":
+        """Function to build the graph from the arrays of another ArrayDiGraph, e.g. memory-mapped
+        from disk. The arrays are used as they are, without sorting or copying them."""
+        graph = cls.__new__(cls)
+        for name in csr_array_names:
+            setattr(graph, name, arrays[name])
+        graph.node_data = {}
+        graph.edge_data = {}
+        graph.graph = {}
+
+        return graph
+
+    @classmethod
+    def from_edge_list(cls, edge_list: pd.DataFrame) -> "ArrayDiGraph":
+        """Function to build the graph from the i and j columns of an edge list.
+        Repeated edges are kept once, like in nx.DiGraph."""
+        origins = edge_list.i.to_numpy(dtype=np.int64)
+        destinations = edge_list.j.to_numpy(dtype=np.int64)
+
+        return cls.from_arrays(origins, destinations)
+
+    @classmethod
+    def from_arrays(
+        cls, origins: np.ndarray, destinations: np.ndarray, node_ids: np.ndarray | None = None
+    ) -> "ArrayDiGraph":
+        """Function to build the graph from arrays of origin and destination node ids"""
+        if node_ids is None:
+            node_ids = np.unique(np.concatenate([origins, destinations]))
+        sources = np.searchsorted(node_ids, origins)
+        targets = np.searchsorted(node_ids, destinations)
+
+        n_nodes = max(len(node_ids), 1)
+        keys = np.unique(sources * n_nodes + targets)
+
+        return cls(node_ids, keys // n_nodes, keys % n_nodes)
+
+    # Lookups
+
+    def get_positions(self, nodes) -> np.ndarray:
+        """Function to get the positions of an array of node ids, -1 if not in the graph"""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        if len(self.node_ids) == 0:
+            return np.full(len(nodes), -1)
+        positions = np.searchsorted(self.node_ids, nodes).clip(max=len(self.node_ids) - 1)
+
+        return np.where(self.node_ids[positions] == nodes, positions, -1)
+
+    def get_position(self, node) -> int:
+        """Function to get the position of a node id, raising KeyError if not in the graph"""
+        position = int(np.searchsorted(self.node_ids, node))
+        if position == len(self.node_ids) or self.node_ids[position] != node:
+            raise KeyError(node)
+        return position
+
+    def get_edge_positions(self, origins, destinations) -> np.ndarray:
+        """Function to get the positions of arrays of edges, -1 if not in the graph"""
+        sources = self.get_positions(origins)
+        targets = self.get_positions(destinations)
+        if len(self.out_targets) == 0:
+            return np.full(len(sources), -1)
+
+        # Edges are sorted by source and target, so their keys are sorted too
+        n_nodes = len(self.node_ids)
+        keys = self.edge_sources * n_nodes + self.out_targets
+        edge_keys = sources * n_nodes + targets
+        positions = np.searchsorted(keys, edge_keys).clip(max=len(keys) - 1)
+        found = (sources != -1) & (targets != -1) & (keys[positions] == edge_keys)
+
+        return np.where(found, positions, -1)
+
+    def get_edge_position(self, i, j) -> int:
+        """Function to get the position of an edge, raising KeyError if not in the graph"""
+        position = int(self.get_edge_positions([i], [j])[0])
+        if position == -1:
+            raise KeyError((i, j))
+        return position
+
+    # networkx-like API
+
+    @property
+    def nodes(self) -> NodeView:
+        return NodeView(self)
+
+    @property
+    def edges(self) -> EdgeView:
+        return EdgeView(self)
+
+    @property
+    def in_degree(self) -> DegreeView:
+        return DegreeView(self, self.in_offsets)
+
+    @property
+    def out_degree(self) -> DegreeView:
+        return DegreeView(self, self.out_offsets)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.nodes)
+
+    def __contains__(self, node) -> bool:
+        return self.has_node(node)
+
+    def __getitem__(self, node) -> list:
+        return self.successors(node)
+
+    def is_directed(self) -> bool:
+        return True
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        return len(self.out_targets)
+
+    def has_node(self, node) -> bool:
+        try:
+            self.get_position(node)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def has_edge(self, i, j) -> bool:
+        return bool(self.get_edge_positions([i], [j])[0] != -1)
+
+    def successors(self, node) -> list:
+        """Function to get the list of nodes owned by a node"""
+        position = self.get_position(node)
+        start, end = self.out_offsets[position], self.out_offsets[position + 1]
+        return self.node_ids[self.out_targets[start:end]].tolist()
+
+    def predecessors(self, node) -> list:
+        """Function to get the list of owners of a node"""
+        position = self.get_position(node)
+        start, end = self.in_offsets[position], self.in_offsets[position + 1]
+        return self.node_ids[self.in_sources[start:end]].tolist()
+
+    neighbors = successors
+
+    def subgraph(self, nodes) -> "ArrayDiGraph":
+        """Function to get the subgraph induced by some nodes, with their attributes"""
+        positions = self.get_positions(np.unique(np.asarray(list(nodes), dtype=np.int64)))
+        positions = positions[positions != -1]
+        keep_nodes = np.zeros(len(self.node_ids), dtype=bool)
+        keep_nodes[positions] = True
+        keep_edges = np.flatnonzero(keep_nodes[self.edge_sources] & keep_nodes[self.out_targets])
+
+        # Positions are sorted, so the edges of the subgraph stay sorted
+        new_positions = np.cumsum(keep_nodes) - 1
+        subgraph = ArrayDiGraph(
+            self.node_ids[positions],
+            new_positions[self.edge_sources[keep_edges]],
+            new_positions[self.out_targets[keep_edges]],
+        )
+        subgraph.node_data = {name: values[positions] for name, values in self.node_data.items()}
+        subgraph.edge_data = {name: values[keep_edges] for name, values in self.edge_data.items()}
+        subgraph.graph = dict(self.graph)
+
+        return subgraph
+
+    # Attributes
+
+    def set_node_attributes(self, values: dict | pd.Series | np.ndarray, name: str) -> None:
+        """Function to set a node attribute from a dictionary or Series keyed by node,
+        or from an array parallel to node_ids. Nodes without a value get NaN."""
+        if isinstance(values, np.ndarray):
+            self.node_data[name] = values
+        else:
+            values = pd.Series(values, dtype=object if len(values) == 0 else None)
+            self.node_data[name] = values.reindex(self.node_ids).to_numpy()
+
+    def set_edge_attributes(self, values: dict | pd.Series | np.ndarray, name: str) -> None:
+        """Function to set an edge attribute from a dictionary or Series keyed by (i, j),
+        or from an array parallel to out_targets. Edges without a value get NaN."""
+        if isinstance(values, np.ndarray):
+            self.edge_data[name] = values
+            return
+
+        values = pd.Series(values, dtype=object if len(values) == 0 else None)
+        edges = list(values.index)
+        origins = np.array([edge[0] for edge in edges], dtype=np.int64)
+        destinations = np.array([edge[1] for edge in edges], dtype=np.int64)
+        positions = self.get_edge_positions(origins, destinations)
+
+        edge_values = pd.Series(np.nan, index=np.arange(len(self.out_targets)), dtype=object)
+        found = positions != -1
+        edge_values.iloc[positions[found]] = values.to_numpy()[found]
+        self.edge_data[name] = edge_values.infer_objects().to_numpy()
+
+    def to_networkx(self) -> nx.DiGraph:
+        """Function to convert the graph to a nx.DiGraph with the same attributes.
+        Nodes only get per-node dictionaries of attributes if the graph has no node table."""
+        graph = nx.DiGraph()
+        graph.graph.update(self.graph)
+        if "node_table" in self.graph:
+            graph.add_nodes_from(self.node_ids.tolist())
+        else:
+            graph.add_nodes_from(self.nodes(data=True))
+        graph.add_edges_from(self.edges(data=True))
+
+        return graph
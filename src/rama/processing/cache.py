@@ -0,0 +1,95 @@
+"""Caching processed database functions"""
+
+import hashlib
+import os
+import shutil
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_VERSION = "5"
+
+cached_frames = ["companies", "merged_firstlink", "psc_companies", "sspsc", "edge_list"]
+
+
+def get_cache_key(
+    path: str,
+    psc_filenames: Sequence[str],
+    companies_filenames: Sequence[str],
+    string_ownership: str = "ownership-of-shares",
+    hash_contents: bool = False,
+    **settings,
+) -> str:
+    """Function to get a key identifying the input files and the processing settings.
+    Files are identified by name, size and modification time, or by a hash of their
+    contents if hash_contents is True."""
+    hasher = hashlib.sha256()
+    hasher.update(f"rama-cache-{CACHE_VERSION}|{string_ownership}".encode())
+    hasher.update(repr(sorted(settings.items())).encode())
+
+    for group in [psc_filenames, companies_filenames]:
+        hasher.update(b"|")
+        for name in group:
+            stat = os.stat(path + name)
+            hasher.update(f"{name}:{stat.st_size}".encode())
+            if hash_contents:
+                with open(path + name, "rb") as file:
+                    for block in iter(lambda: file.read(1 << 20), b""):
+                        hasher.update(block)
+            else:
+                hasher.update(f":{stat.st_mtime_ns}".encode())
+
+    return hasher.hexdigest()[:20]
+
+
+def get_file_hash(filename: str | None) -> str | None:
+    """Function to get a hash of the contents of a file, or None if there is no file"""
+    if filename is None or not os.path.exists(filename):
+        return None
+
+    hasher = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            hasher.update(block)
+
+    return hasher.hexdigest()
+
+
+def save_processed(
+    cache_path: str, list_dfs: Sequence[pd.DataFrame], edge_list: pd.DataFrame
+) -> None:
+    """Function to save the outputs of process_database as Parquet files.
+    Files are written to a temporary folder first so an interrupted save is never read."""
+    tmp_path = cache_path + ".tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+
+    for name, df in zip(cached_frames, [*list_dfs, edge_list]):
+        df.to_parquet(os.path.join(tmp_path, name + ".parquet"))
+
+    if os.path.exists(cache_path):
+        shutil.rmtree(cache_path)
+    os.replace(tmp_path, cache_path)
+
+
+def load_processed(cache_path: str) -> tuple | None:
+    """Function to load the outputs of process_database from the cache.
+    Returns None if there is no complete cache entry."""
+    filenames = [os.path.join(cache_path, name + ".parquet") for name in cached_frames]
+    if not all(os.path.exists(filename) for filename in filenames):
+        return None
+
+    dfs = [pd.read_parquet(filename) for filename in filenames]
+
+    # Parquet gives missing strings back as None and the parsed natures of control as arrays
+    for name, df in zip(cached_frames, dfs):
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].where(df[column].notna(), np.nan)
+        if name in ["merged_firstlink", "psc_companies"]:
+            df["natures_of_control"] = df.natures_of_control.map(list)
+
+    list_dfs = dfs[:-1]
+    edge_list = dfs[-1]
+
+    return list_dfs, edge_list
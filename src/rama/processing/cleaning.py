@@ -4,33 +4,75 @@ from typing import Sequence
 
 import pandas as pd
 
-from rama.processing.helper_functions import fill_company_number
+from rama.processing.natures import contains_nature, encode_natures_of_control
+from rama.processing.normalise import normalise_company_names, normalise_company_numbers
 
 
 def clean_psc(
-    arr_psc: Sequence[pd.DataFrame], string_ownership: str = "ownership-of-shares"
+    arr_psc: Sequence[pd.DataFrame],
+    string_ownership: str = "ownership-of-shares",
+    already_clean: bool = False,
 ) -> pd.DataFrame:
     """Function to clean PSC pd.DataFrame ad hoc.
-    In the future might be changed according to the CSV file."""
+    In the future might be changed according to the CSV file.
+    If already_clean is True, the parts were cleaned by clean_psc_chunk when they were read
+    and are only concatenated."""
+    if already_clean:
+        return concat_parts(arr_psc)
 
-    psc = pd.concat(arr_psc).reset_index(drop=True)
-    psc = psc.drop(columns=["Unnamed: 0.1", "Unnamed: 0"])
-    psc.natures_of_control.fillna("", inplace=True)
-    psc = psc[psc.natures_of_control.str.contains(string_ownership)]
-    psc.loc[:, "name"] = psc.name.str.lower().str.replace("ltd", "limited", regex=True).str.strip()
-    psc.company_number = psc.company_number.apply(fill_company_number)
+    psc = pd.concat(arr_psc, ignore_index=True)
+
+    return clean_psc_chunk(psc, string_ownership)
+
+
+def concat_parts(parts: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """Function to concatenate cleaned parts, a single part being returned without a copy"""
+    if len(parts) == 1:
+        return parts[0]
+
+    return pd.concat(parts, ignore_index=True)
+
+
+def clean_psc_chunk(
+    psc: pd.DataFrame, string_ownership: str = "ownership-of-shares"
+) -> pd.DataFrame:
+    """Function to filter and normalise a single chunk of the PSC file.
+    Rows and columns are selected in a single step, so the chunk is copied only once.
+    The natures of control are also encoded once as the natures_mask bitmask column."""
+    natures_of_control = psc.natures_of_control.fillna("")
+    keep_rows = contains_nature(natures_of_control, string_ownership)
+    keep_columns = psc.columns.difference(["Unnamed: 0.1", "Unnamed: 0"], sort=False)
+
+    psc = psc.loc[keep_rows, keep_columns]
+    psc["natures_of_control"] = natures_of_control[keep_rows]
+    psc["natures_mask"] = encode_natures_of_control(psc.natures_of_control)
+    psc["name"] = normalise_company_names(psc.name)
+    psc["company_number"] = normalise_company_numbers(psc.company_number)
 
     return psc
 
 
-def clean_companies(arr_companies: Sequence[pd.DataFrame]) -> pd.DataFrame:
+def clean_companies(
+    arr_companies: Sequence[pd.DataFrame], already_clean: bool = False
+) -> pd.DataFrame:
     """Function to clean the companies pd.DataFrame ad hoc.
-    In the future might be changed according to the CSV file."""
-    companies = pd.concat(arr_companies).drop(columns=["Unnamed: 0"]).reset_index(drop=True)
+    In the future might be changed according to the CSV file.
+    If already_clean is True, the parts were cleaned by clean_companies_chunk when they were
+    read and are only concatenated."""
+    if already_clean:
+        return concat_parts(arr_companies)
+
+    companies = pd.concat(arr_companies, ignore_index=True)
+
+    return clean_companies_chunk(companies)
+
+
+def clean_companies_chunk(companies: pd.DataFrame) -> pd.DataFrame:
+    """Function to normalise a single chunk of the companies file."""
+    keep_columns = companies.columns.difference(["Unnamed: 0"], sort=False)
+    companies = companies.loc[:, keep_columns]
 
-    companies.company_number = companies.company_number.astype(str).apply(fill_company_number)
-    companies.loc[:, "company_name"] = (
-        companies.company_name.str.lower().str.replace("ltd", "limited", regex=True).str.strip()
-    )
+    companies["company_number"] = normalise_company_numbers(companies.company_number)
+    companies["company_name"] = normalise_company_names(companies.company_name)
 
     return companies
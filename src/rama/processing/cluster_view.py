@@ -0,0 +1,141 @@
+"""Lazy views of the clusters functions"""
+
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Iterator
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from rama.processing.array_graph import ArrayDiGraph, get_python_value
+from rama.processing.components import Components
+from rama.processing.node_attributes import get_nodes_attributes
+from rama.processing.study_graphs import (
+    get_cluster_summaries,
+    get_dates_with_nans,
+    get_dict_branches,
+    get_max_length,
+)
+
+
+cluster_fields = [
+    "number_of_nodes",
+    "number_of_roots",
+    "number_of_branches",
+    "list_of_nodes",
+    "max_length",
+    "number_of_humans",
+    "dates_of_creation",
+    "growing_time",
+    "min_date_of_creation",
+    "max_date_of_creation",
+    "sic_codes",
+    "dict_branches",
+    "class_int",
+    "class_str",
+]
+
+
+class ClusterView(Mapping):
+    """Read-only view of one cluster, with the same fields as the dictionary of get_dict_cluster
+    after classify_cluster. Fields are computed when they are read."""
+
+    def __init__(self, clusters: "LazyClusters", number_of_cluster: int) -> None:
+        self.clusters = clusters
+        self.number_of_cluster = number_of_cluster
+
+    def __getitem__(self, field: str):
+        return self.clusters.get_field(self.number_of_cluster, field)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(cluster_fields)
+
+    def __len__(self) -> int:
+        return len(cluster_fields)
+
+    def __repr__(self) -> str:
+        return f"ClusterView({self.number_of_cluster})"
+
+
+class LazyClusters(Mapping):
+    """Read-only mapping from cluster number to a ClusterView, like dict_cluster.
+    The summaries of all the clusters are given, e.g. as saved by save_initialised, or computed
+    at once by get_cluster_summaries. The other fields, and the max length of the clusters that
+    are not small, are computed from the graph when they are first read, and the last max_cached
+    of them are kept (none if max_cached is 0)."""
+
+    def __init__(
+        self,
+        graph: nx.DiGraph | ArrayDiGraph,
+        components: Components,
+        max_small_size: int = 3,
+        max_cached: int = 10_000,
+        summaries: dict | None = None,
+    ) -> None:
+        self.graph = graph
+        self.components = components
+        if summaries is None:
+            summaries = get_cluster_summaries(graph, components, max_small_size)
+        self.summaries = summaries
+        self.max_cached = max_cached
+        self.cache: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.components)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+    def __getitem__(self, number_of_cluster: int) -> ClusterView:
+        if not 0 <= number_of_cluster < len(self):
+            raise KeyError(number_of_cluster)
+
+        return ClusterView(self, number_of_cluster)
+
+    def get_field(self, number_of_cluster: int, field: str):
+        """Function to get a field of a cluster, from the summaries or the cache if possible"""
+        if field == "list_of_nodes":
+            return self.components[number_of_cluster].tolist()
+        if field in self.summaries and not (
+            field == "max_length" and self.summaries[field][number_of_cluster] < 0
+        ):
+            return get_summary_value(self.summaries[field][number_of_cluster])
+        if field not in cluster_fields:
+            raise KeyError(field)
+
+        key = (number_of_cluster, field)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        value = self.compute_field(number_of_cluster, field)
+        if self.max_cached > 0:
+            self.cache[key] = value
+            if len(self.cache) > self.max_cached:
+                self.cache.popitem(last=False)
+
+        return value
+
+    def compute_field(self, number_of_cluster: int, field: str):
+        """Function to compute a field of a cluster that is not in the summaries"""
+        list_nodes = self.components[number_of_cluster].tolist()
+        if field == "max_length":
+            return get_max_length(self.graph, list_nodes)
+        if field == "dates_of_creation":
+            return get_dates_with_nans(self.graph, list_nodes)
+        if field == "sic_codes":
+            return np.array(
+                get_nodes_attributes(self.graph, list_nodes, ["sic_codes"]).sic_codes.tolist()
+            )
+
+        return get_dict_branches(self.graph, list_nodes)
+
+
+def get_summary_value(value):
+    """Function to convert a summary value back to the Python object of dict_cluster.
+    Missing dates are NaN, as in get_min_max_dates."""
+    if isinstance(value, np.datetime64):
+        return np.nan if np.isnat(value) else pd.Timestamp(value).to_pydatetime()
+
+    return get_python_value(value)
@@ -0,0 +1,122 @@
+"""Company lookup index functions"""
+
+import numpy as np
+import pandas as pd
+
+from rama.processing.lists import uk_registries_pattern
+from rama.processing.normalise import normalise_company_names, normalise_company_numbers
+
+
+previous_names_pattern = r"""'name': (?:'([^']*)'|"([^"]*)")"""
+
+
+def get_previous_names(companies: pd.DataFrame) -> pd.DataFrame:
+    """Function to get the previous names of the companies, one row per name.
+    Both the PreviousName_k.CompanyName columns of the bulk file and the
+    previous_company_names column of the API file are read."""
+    list_names = []
+    for k in range(1, 11):
+        column = f"PreviousName_{k}.CompanyName"
+        if column in companies.columns:
+            list_names.append(
+                pd.DataFrame(
+                    {"company_number": companies.company_number, "company_name": companies[column]}
+                )
+            )
+
+    if "previous_company_names" in companies.columns:
+        previous = companies.previous_company_names.dropna().astype(str)
+        names = previous.str.extractall(previous_names_pattern)
+        names = names[0].fillna(names[1])
+        list_names.append(
+            pd.DataFrame(
+                {
+                    "company_number": companies.company_number.loc[
+                        names.index.get_level_values(0)
+                    ].values,
+                    "company_name": names.values,
+                }
+            )
+        )
+
+    if len(list_names) == 0:
+        return pd.DataFrame(columns=["company_number", "company_name"])
+
+    previous_names = pd.concat(list_names, ignore_index=True).dropna()
+    previous_names["company_name"] = normalise_company_names(previous_names.company_name)
+
+    return previous_names
+
+
+def get_company_names(companies: pd.DataFrame) -> pd.DataFrame:
+    """Function to get every current and previous name of the companies, one row per name.
+    The current names come first."""
+    current_names = companies[["company_number", "company_name"]].dropna()
+    current_names = current_names.drop_duplicates("company_number")
+    current_names["current"] = True
+
+    previous_names = get_previous_names(companies)
+    previous_names["current"] = False
+
+    return pd.concat([current_names, previous_names], ignore_index=True)
+
+
+def get_company_index(company_names: pd.DataFrame) -> tuple:
+    """Function to build the lookup index of the companies from get_company_names().
+    Returns two Series: normalised name (current or previous) -> company number and
+    company number -> current name. When a name was used by several companies,
+    current names take priority."""
+    unique_names = company_names.drop_duplicates("company_name")
+    names_index = pd.Series(
+        unique_names.company_number.values, index=unique_names.company_name.values
+    )
+
+    current_names = company_names[company_names.current]
+    current_names_index = pd.Series(
+        current_names.company_name.values, index=current_names.company_number.values
+    )
+
+    return names_index, current_names_index
+
+
+def is_uk_registry(countries_registered: pd.Series, places_registered: pd.Series) -> np.ndarray:
+    """Function to check which corporate PSCs are registered in the UK, from the country or
+    the place of their register, e.g. 'England' or 'Companies House'"""
+    registries = countries_registered.fillna("") + " " + places_registered.fillna("")
+
+    return registries.str.lower().str.contains(uk_registries_pattern, regex=True).to_numpy()
+
+
+def resolve_company_names(
+    names: pd.Series,
+    registration_numbers: pd.Series,
+    companies: pd.DataFrame,
+    countries_registered: pd.Series | None = None,
+    places_registered: pd.Series | None = None,
+) -> pd.Series:
+    """Function to resolve the names of corporate PSCs to the current name of the company.
+    Each PSC is looked up by registration number and by current and previous names in one
+    vectorised pass. As foreign registration numbers can look like company numbers, a
+    registration number is only used when it agrees with the name, or when the name is unknown
+    and the country or place registered is a UK registry.
+    PSCs that are not found keep their name."""
+    company_names = get_company_names(companies)
+    names_index, current_names_index = get_company_index(company_names)
+
+    by_number = normalise_company_numbers(registration_numbers)
+    by_number = by_number.where(by_number.isin(current_names_index.index))
+    by_name = names.map(names_index)
+
+    name_pairs = pd.MultiIndex.from_frame(company_names[["company_name", "company_number"]])
+    by_number_confirmed = pd.MultiIndex.from_arrays([names, by_number]).isin(name_pairs)
+
+    missing = pd.Series(np.nan, index=names.index, dtype=object)
+    uk_registry = is_uk_registry(
+        missing if countries_registered is None else countries_registered,
+        missing if places_registered is None else places_registered,
+    )
+
+    use_number = by_number.notna() & (by_number_confirmed | (by_name.isna() & uk_registry))
+    company_numbers = by_number.where(use_number, by_name)
+
+    return company_numbers.map(current_names_index).fillna(names)
@@ -0,0 +1,112 @@
+"""Weakly connected components over edge arrays functions"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class Components(Sequence):
+    """Sequence of the weakly connected components of a graph, from the largest to the smallest,
+    ties broken by their smallest node. Component k is the sorted array of node ids
+    nodes[offsets[k]:offsets[k + 1]], and labels gives the component of each of the sorted
+    node_ids."""
+
+    def __init__(
+        self, node_ids: np.ndarray, labels: np.ndarray, nodes: np.ndarray, offsets: np.ndarray
+    ) -> None:
+        self.node_ids = node_ids
+        self.labels = labels
+        self.nodes = nodes
+        self.offsets = offsets
+
+    @classmethod
+    def from_offsets(
+        cls, node_ids: np.ndarray, nodes: np.ndarray, offsets: np.ndarray
+    ) -> "Components":
+        """Function to build the components from the nodes grouped by component and their offsets"""
+        labels = np.empty(len(node_ids), dtype=np.int64)
+        labels[np.searchsorted(node_ids, nodes)] = np.repeat(
+            np.arange(len(offsets) - 1), np.diff(offsets)
+        )
+
+        return cls(node_ids, labels, nodes, offsets)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Number of nodes of every component"""
+        return np.diff(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+
+        return self.nodes[self.offsets[k] : self.offsets[k + 1]]
+
+    def get_component(self, node) -> int:
+        """Function to get the number of the component of a node"""
+        return int(self.labels[np.searchsorted(self.node_ids, node)])
+
+
+def get_component_labels(sources: np.ndarray, targets: np.ndarray, n_nodes: int) -> np.ndarray:
+    """Function to get the weakly connected component of every node position, as the smallest
+    position of its component. Labels are propagated along the edges: every root is hooked to the
+    smallest root it is linked to, and pointer jumping flattens the trees after each round."""
+    labels = np.arange(n_nodes)
+    while True:
+        # Pointer jumping, until every node points to the root of its tree
+        while True:
+            parents = labels[labels]
+            if np.array_equal(parents, labels):
+                break
+            labels = parents
+
+        source_labels = labels[sources]
+        target_labels = labels[targets]
+        linked = source_labels != target_labels
+        if not linked.any():
+            return labels
+
+        np.minimum.at(
+            labels,
+            np.maximum(source_labels[linked], target_labels[linked]),
+            np.minimum(source_labels[linked], target_labels[linked]),
+        )
+
+
+def get_components(
+    origins: np.ndarray, destinations: np.ndarray, node_ids: np.ndarray | None = None
+) -> Components:
+    """Function to get the weakly connected components of the graph with the given edges.
+    node_ids are the sorted node ids, by default the nodes of the edges."""
+    origins = np.asarray(origins, dtype=np.int64)
+    destinations = np.asarray(destinations, dtype=np.int64)
+    if node_ids is None:
+        node_ids = np.sort(np.concatenate([origins, destinations]))
+        is_first = np.ones(len(node_ids), dtype=bool)
+        is_first[1:] = node_ids[1:] != node_ids[:-1]
+        node_ids = node_ids[is_first]
+
+    roots = get_component_labels(
+        np.searchsorted(node_ids, origins), np.searchsorted(node_ids, destinations), len(node_ids)
+    )
+
+    # Roots are the smallest position of their component, so ties are broken by smallest node
+    sizes = np.bincount(roots, minlength=len(node_ids))
+    root_positions = np.flatnonzero(sizes)
+    order = np.lexsort((root_positions, -sizes[root_positions]))
+
+    component_numbers = np.empty(len(node_ids), dtype=np.int64)
+    component_numbers[root_positions[order]] = np.arange(len(order))
+    labels = component_numbers[roots]
+
+    nodes = node_ids[np.argsort(labels, kind="stable")]
+    offsets = np.concatenate([[0], np.cumsum(sizes[root_positions[order]])])
+
+    return Components(node_ids, labels, nodes, offsets)
@@ -7,6 +7,9 @@ from typing import Sequence
 import numpy as np
 import pandas as pd
 
+from rama.processing.company_index import resolve_company_names
+from rama.processing.identity import get_identity_merge_map
+
 
 def check_dir_exists(path: str) -> None:
     """Checks if folder directory already exists, else makes directory.
@@ -56,29 +59,37 @@ def get_human_company_links(
     psc_columns: list,
     human_kinds: list,
     companies_columns: list,
+    resolve_identities: bool = False,
 ) -> pd.DataFrame:
-    """Function to link a human PSC with a company they own/control"""
+    """Function to link a human PSC with a company they own/control.
+    If resolve_identities is True, variants of the same person (titles, initials, missing
+    middle names) get the same idx_human, see get_identity_merge_map()."""
     psc_humans = psc[psc_columns]
     psc_humans = psc_humans.loc[
         (psc.company_number.isin(mutual_company_numbers)) & (psc.kind.isin(human_kinds))
     ].reset_index(drop=True)
-    duplicated_humans = psc_humans.duplicated(
-        subset=["name", "date_of_birth.year", "date_of_birth.month"]
-    )
-    all_duplicated_humans = psc_humans.duplicated(
-        subset=["name", "date_of_birth.year", "date_of_birth.month"], keep=False
-    )
-    humans_bool = np.logical_or(duplicated_humans, ~all_duplicated_humans)
-
-    idx_humans = [int(i) + 1 for i in range(sum(humans_bool))]
-    psc_humans.loc[humans_bool, ["idx_human"]] = idx_humans
-
-    psc_humans["idx_human"].fillna(
-        psc_humans.groupby(["name", "date_of_birth.year", "date_of_birth.month"])[
-            "idx_human"
-        ].transform("first"),
-        inplace=True,
-    )
+    if resolve_identities:
+        psc_humans["idx_human"] = (get_identity_merge_map(psc_humans) + 1).astype(float)
+        n_humans = int(psc_humans.idx_human.max()) if len(psc_humans) > 0 else 0
+    else:
+        duplicated_humans = psc_humans.duplicated(
+            subset=["name", "date_of_birth.year", "date_of_birth.month"]
+        )
+        all_duplicated_humans = psc_humans.duplicated(
+            subset=["name", "date_of_birth.year", "date_of_birth.month"], keep=False
+        )
+        humans_bool = np.logical_or(duplicated_humans, ~all_duplicated_humans)
+
+        idx_humans = [int(i) + 1 for i in range(sum(humans_bool))]
+        psc_humans.loc[humans_bool, ["idx_human"]] = idx_humans
+
+        psc_humans["idx_human"].fillna(
+            psc_humans.groupby(["name", "date_of_birth.year", "date_of_birth.month"])[
+                "idx_human"
+            ].transform("first"),
+            inplace=True,
+        )
+        n_humans = len(idx_humans)
 
     if "CompanyNumber" in companies.columns:
         companies_mutual = companies.loc[
@@ -93,9 +104,7 @@ def get_human_company_links(
 
     companies_bool = np.logical_or(duplicated_companies, ~all_duplicated_companies)
 
-    idx_companies = [
-        int(i) + 1 for i in range(len(idx_humans), len(idx_humans) + sum(companies_bool))
-    ]
+    idx_companies = [int(i) + 1 for i in range(n_humans, n_humans + sum(companies_bool))]
     companies_mutual.loc[companies_bool, ["idx_company"]] = idx_companies
 
     companies_mutual["idx_company"].fillna(
@@ -112,9 +121,15 @@ def get_human_company_links(
 
 
 def get_company_company_link(
-    psc: pd.DataFrame, companies: pd.DataFrame, small_firstlink: pd.DataFrame, company_kinds: list
+    psc: pd.DataFrame,
+    companies: pd.DataFrame,
+    small_firstlink: pd.DataFrame,
+    company_kinds: list,
+    resolve_companies: bool = False,
 ) -> pd.DataFrame:
-    """Function to link a company PSC with another company it owns/controls"""
+    """Function to link a company PSC with another company it owns/controls.
+    If resolve_companies is True, the company PSCs are first renamed to the current name of
+    the company they are registered as, see resolve_company_names()."""
 
     psc_companies = psc.loc[(psc.kind.isin(company_kinds))].reset_index(drop=True)
 
@@ -127,6 +142,17 @@ def get_company_company_link(
         companies = companies.rename(columns={"CompanyNumber": "company_number"})
     if "company_name" not in companies.columns:
         companies = companies.rename(columns={"CompanyName": "company_name"})
+
+    if resolve_companies:
+        missing = pd.Series(np.nan, index=psc_companies.index, dtype=object)
+        psc_companies["company_name"] = resolve_company_names(
+            psc_companies.company_name,
+            psc_companies.get("identification.registration_number", missing),
+            companies,
+            psc_companies.get("identification.country_registered", missing),
+            psc_companies.get("identification.place_registered", missing),
+        )
+
     names_owned = companies.loc[
         companies.company_number.isin(psc_companies.company_number),
         ["company_number", "company_name"],
@@ -192,11 +218,14 @@ def get_company_company_link(
     unique_names_owned = names_owned.company_name.unique()
     min_ = max_
     max_ = min_ + len(unique_names_owned)
-    idxs = [i + 1 for i in range(min_, max_)]
-
-    for idx, name in enumerate(unique_names_owned):
-        psc_companies.loc[psc_companies.company_name == name, "idx_company"] = idxs[idx]
-        psc_companies.loc[psc_companies.company_name_2 == name, "idx_company_2"] = idxs[idx]
+    idxs = pd.Series(np.arange(min_ + 1, max_ + 1), index=unique_names_owned)
+    idxs = idxs[idxs.index.notna()]
+
+    # One hash lookup per row instead of a full scan per name
+    idxs_owner = psc_companies.company_name.map(idxs)
+    idxs_owned = psc_companies.company_name_2.map(idxs)
+    psc_companies["idx_company"] = idxs_owner.fillna(psc_companies.idx_company)
+    psc_companies["idx_company_2"] = idxs_owned.fillna(psc_companies.idx_company_2)
 
     # Detect those owned companies that have been indexed as owners
     idxs_nan = psc_companies.idx_company_2.isna()
@@ -0,0 +1,149 @@
+"""Human identity resolution functions"""
+
+from itertools import combinations
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from rama.processing.lists import human_titles
+from rama.processing.normalise import map_unique_values
+
+
+name_parts = ["forename", "middle_name", "surname"]
+
+identity_columns = [
+    "forename",
+    "middle_name",
+    "surname",
+    "date_of_birth.year",
+    "date_of_birth.month",
+]
+
+
+def remove_titles(names: pd.Series) -> pd.Series:
+    """Function to lower-case an array of name elements and remove punctuation and titles"""
+    names = names.str.lower().str.replace(r"[^\w\s]", " ", regex=True)
+    titles = r"\b(" + "|".join(human_titles) + r")\b"
+    names = names.str.replace(titles, " ", regex=True).str.replace(r"\s+", " ", regex=True)
+
+    return names.str.strip()
+
+
+def clean_name_elements(names: pd.Series) -> pd.Series:
+    """Function to clean the unique values of an array of name elements only.
+    Elements left empty are NaN."""
+    names = map_unique_values(names, remove_titles)
+
+    return names.where(names != "", np.nan)
+
+
+def get_name_parts(psc_humans: pd.DataFrame) -> pd.DataFrame:
+    """Function to get the forename, middle name and surname of every human PSC.
+    The name_elements columns are used when the forename and surname are known,
+    else the parts are taken from the name."""
+    parts = pd.DataFrame(np.nan, index=psc_humans.index, columns=name_parts, dtype=object)
+    for part in name_parts:
+        column = "name_elements." + part
+        if column in psc_humans.columns:
+            parts[part] = clean_name_elements(psc_humans[column])
+
+    from_name = parts.forename.isna() | parts.surname.isna()
+    names = clean_name_elements(psc_humans.name[from_name])
+    parts.loc[from_name, "forename"] = names.str.extract(r"^(\S+) ", expand=False)
+    parts.loc[from_name, "middle_name"] = names.str.extract(r"^\S+ (.+) \S+$", expand=False)
+    parts.loc[from_name, "surname"] = names.str.extract(r"(\S+)$", expand=False)
+
+    parts["date_of_birth.year"] = psc_humans["date_of_birth.year"]
+    parts["date_of_birth.month"] = psc_humans["date_of_birth.month"]
+
+    return parts
+
+
+def is_initial_of(initial, name) -> bool:
+    """Function to check if a name element is the initial of another one"""
+    return len(initial) == 1 and name.startswith(initial)
+
+
+def are_compatible(profile_a: tuple, profile_b: tuple, ambiguous: set) -> bool:
+    """Function to check if two (forename, middle name) profiles can be the same person.
+    Initials match the full element and a missing middle name matches any middle name,
+    unless that is ambiguous inside the block."""
+    for position, (element_a, element_b) in enumerate(zip(profile_a, profile_b)):
+        if element_a is element_b or element_a == element_b:
+            continue
+        if pd.isna(element_a) or pd.isna(element_b):
+            if position == 0 or "" in ambiguous:
+                return False
+            continue
+        if element_a in ambiguous or element_b in ambiguous:
+            return False
+        if not (is_initial_of(element_a, element_b) or is_initial_of(element_b, element_a)):
+            return False
+
+    return True
+
+
+def get_ambiguous_initials(profiles: list) -> set:
+    """Function to get the initials of a block shared by several different full name elements.
+    The empty string is included when the block has middle names with different initials."""
+    ambiguous = set()
+    for position in range(2):
+        elements = {profile[position] for profile in profiles if not pd.isna(profile[position])}
+        initials = pd.Series([element[0] for element in elements if len(element) > 1], dtype=object)
+        ambiguous |= set(initials[initials.duplicated()])
+
+        if position == 1 and len({element[0] for element in elements}) > 1:
+            ambiguous.add("")
+
+    return ambiguous
+
+
+def get_block_matches(nodes: np.ndarray, values: list) -> list:
+    """Function to get the pairs of compatible profiles inside one block"""
+    ambiguous = get_ambiguous_initials(values)
+
+    return [
+        (nodes[a], nodes[b])
+        for a, b in combinations(range(len(values)), 2)
+        if are_compatible(values[a], values[b], ambiguous)
+    ]
+
+
+def get_identity_merge_map(psc_humans: pd.DataFrame) -> pd.Series:
+    """Function to get the resolved identity of every human PSC.
+    Profiles are blocked by surname and date of birth, only profiles inside the same block
+    are compared, and the matches are merged with connected components. Profiles without a
+    surname or a full date of birth are not compared, as their blocks could hold every person
+    with the same surname.
+    Returns an integer identity per row, numbered in order of first appearance."""
+    parts = get_name_parts(psc_humans)
+    profile_codes = parts.groupby(identity_columns, dropna=False, sort=False).ngroup().values
+    profiles = parts[identity_columns].drop_duplicates().reset_index(drop=True)
+
+    block_codes = profiles.groupby(
+        ["surname", "date_of_birth.year", "date_of_birth.month"], dropna=False
+    ).ngroup()
+    block_sizes = block_codes.map(block_codes.value_counts())
+
+    # Profiles without a surname or a date of birth are never merged with other profiles
+    is_blocked = profiles[["surname", "date_of_birth.year", "date_of_birth.month"]].notna()
+    to_compare = np.where((block_sizes > 1) & is_blocked.all(axis=1))[0]
+    to_compare = to_compare[np.argsort(block_codes.values[to_compare], kind="stable")]
+    block_starts = np.flatnonzero(np.diff(block_codes.values[to_compare], prepend=-1))
+    values = list(
+        zip(profiles.forename.values[to_compare], profiles.middle_name.values[to_compare])
+    )
+
+    graph_identities = nx.Graph()
+    for start, end in zip(block_starts, np.append(block_starts[1:], len(to_compare))):
+        graph_identities.add_edges_from(get_block_matches(to_compare[start:end], values[start:end]))
+
+    # Profiles without matches are not in the graph and keep their own identity
+    profile_identities = np.arange(len(profiles))
+    for component in nx.connected_components(graph_identities):
+        profile_identities[list(component)] = min(component)
+
+    identities = pd.factorize(profile_identities[profile_codes])[0]
+
+    return pd.Series(identities, index=psc_humans.index, name="identity")
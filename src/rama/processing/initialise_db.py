@@ -1,55 +1,172 @@
 """Initiate database functions"""
 
+import os
 from typing import Sequence
 
-import networkx as nx
-import pandas as pd
-
+from rama.processing.cache import (
+    get_cache_key,
+    get_file_hash,
+    load_processed,
+    save_processed,
+)
+from rama.processing.cluster_view import LazyClusters
+from rama.processing.components import get_components
 from rama.processing.load_database_pipeline import get_graph, process_database
 from rama.processing.node_attributes import set_attributes
-from rama.processing.study_graphs import classify_cluster, get_dict_cluster
+from rama.processing.parallel_clusters import get_dict_clusters
+from rama.processing.reading import (
+    read_companies_part,
+    read_parts_parallel,
+    read_psc_part,
+)
+from rama.processing.registry import EntityRegistry
 
 
-def initialise(
+def load_database(
     path: str,
     psc_filenames: Sequence[str],
     companies_filenames: Sequence[str],
     string_ownership: str = "ownership-of-shares",
+    chunksize: int | None = None,
+    n_workers: int = 1,
+    compact: bool = False,
+    registry: EntityRegistry | None = None,
+    resolve_identities: bool = False,
+    resolve_companies: bool = False,
 ) -> tuple:
-    """Function to initialise the usual database"""
+    """Function to read the files and return the processed dataframes and the edgelist.
+    Every part file is cleaned as it is read, and the cleaned parts are only concatenated.
+    If chunksize is given, the files are streamed in chunks of that many rows,
+    parsing only the needed columns and cleaning each chunk as it is read.
+    PSC files whose first line is a JSON record are read as the JSON lines snapshot.
+    If n_workers > 1, the part files are read and cleaned in parallel by that many processes.
+    If compact is True, the dataframes are converted to compact dtypes.
+    If a registry is given, the node ids are taken from it (see process_database()).
+    If resolve_identities is True, spelling variants of the same human get the same node.
+    If resolve_companies is True, renamed companies get the same node as owners and owned."""
+
+    if n_workers > 1:
+        list_pscs, list_companies = read_parts_parallel(
+            path, psc_filenames, companies_filenames, string_ownership, chunksize, n_workers
+        )
+    else:
+        list_pscs = [
+            read_psc_part(path, name, string_ownership, chunksize) for name in psc_filenames
+        ]
+        list_companies = [
+            read_companies_part(path, name, chunksize) for name in companies_filenames
+        ]
+
+    list_dfs, edge_list = process_database(
+        list_pscs,
+        list_companies,
+        string_ownership,
+        compact,
+        registry,
+        resolve_identities,
+        resolve_companies,
+        already_clean=True,
+    )
 
-    list_pscs = []
-    for name in psc_filenames:
-        psc_dummy = pd.read_csv(path + name)
-        list_pscs.append(psc_dummy)
+    return list_dfs, edge_list
 
-    list_companies = []
-    for name in companies_filenames:
-        companies_dummy = pd.read_csv(path + name)
-        list_companies.append(companies_dummy)
 
-    list_dfs, edge_list = process_database(list_pscs, list_companies, string_ownership)
+def initialise(
+    path: str,
+    psc_filenames: Sequence[str],
+    companies_filenames: Sequence[str],
+    string_ownership: str = "ownership-of-shares",
+    chunksize: int | None = None,
+    cache_dir: str | None = None,
+    n_workers: int = 1,
+    compact: bool = False,
+    registry_path: str | None = None,
+    resolve_identities: bool = False,
+    resolve_companies: bool = False,
+    backend: str = "networkx",
+    lazy: bool = False,
+    node_dicts: bool = False,
+) -> tuple:
+    """Function to initialise the usual database.
+    If cache_dir is given, the processed dataframes are stored there as Parquet files,
+    keyed by the input files, string_ownership, the settings and the contents of the registry,
+    and reused when nothing has changed.
+    If registry_path is given, node ids are stable across runs and snapshots: they are read
+    from the entity registry stored there, which is updated with the new entities.
+    With backend="array", the graph is an ArrayDiGraph instead of a nx.DiGraph.
+    If n_workers > 1, the clusters are also analysed in parallel by that many processes.
+    If lazy is True, dict_cluster is a LazyClusters mapping: the summaries of the clusters are
+    computed at once, and their other fields only when they are read.
+    The node attributes are kept in graph.graph["node_table"]. If node_dicts is True, a nx.DiGraph
+    also gets them as per-node dictionaries, for code that reads graph.nodes[node] directly.
+    The other keyword arguments are described in load_database()."""
+
+    processed = None
+    cache_settings = {
+        "compact": compact,
+        "registry_path": registry_path,
+        "resolve_identities": resolve_identities,
+        "resolve_companies": resolve_companies,
+    }
+    if cache_dir is not None:
+        cache_key = get_cache_key(
+            path,
+            psc_filenames,
+            companies_filenames,
+            string_ownership,
+            registry_hash=get_file_hash(registry_path),
+            **cache_settings,
+        )
+        processed = load_processed(os.path.join(cache_dir, cache_key))
+
+    if processed is None:
+        registry = None if registry_path is None else EntityRegistry(registry_path)
+        processed = load_database(
+            path,
+            psc_filenames,
+            companies_filenames,
+            string_ownership,
+            chunksize,
+            n_workers,
+            compact,
+            registry,
+            resolve_identities,
+            resolve_companies,
+        )
+        if registry is not None:
+            registry.save()
+        if cache_dir is not None:
+            # The node ids only hold for the registry as it is after this run
+            cache_key = get_cache_key(
+                path,
+                psc_filenames,
+                companies_filenames,
+                string_ownership,
+                registry_hash=get_file_hash(registry_path),
+                **cache_settings,
+            )
+            save_processed(os.path.join(cache_dir, cache_key), *processed)
+
+    list_dfs, edge_list = processed
 
     companies = list_dfs[0]
     merged_firstlink = list_dfs[1]
     psc_companies = list_dfs[2]
 
     # Get graph
-    graph = get_graph(edge_list)
+    graph = get_graph(edge_list, backend)
 
     # Set attributes
-    set_attributes(graph, merged_firstlink, psc_companies, companies)
+    set_attributes(graph, merged_firstlink, psc_companies, companies, node_dicts)
 
     # Connected components
-    connected_components = list(
-        sorted(nx.weakly_connected_components(graph), key=len, reverse=True)
-    )
+    connected_components = get_components(edge_list.i.to_numpy(), edge_list.j.to_numpy())
 
     # Set attributes to connected components
-    dict_cluster = {}
-    for number_of_cluster, set_nodes in enumerate(connected_components):
-        dict_cluster_unclassified = get_dict_cluster(graph, list(set_nodes))
-        dict_cluster[number_of_cluster] = classify_cluster(dict_cluster_unclassified)
+    if lazy:
+        dict_cluster = LazyClusters(graph, connected_components)
+    else:
+        dict_cluster = get_dict_clusters(graph, connected_components, n_workers)
 
     return graph, connected_components, dict_cluster
 
@@ -59,10 +176,14 @@ def initialise_humans(
     psc_filenames: Sequence[str],
     companies_filenames: Sequence[str],
     string_ownership: str = "ownership-of-shares",
+    **kwargs,
 ) -> tuple:
-    """Function to initialise and get the graphs with human roots"""
+    """Function to initialise and get the graphs with human roots.
+    Keyword arguments are passed on to initialise(). Only the summaries of the clusters are read,
+    so they are not analysed in full unless lazy=False is given."""
+    kwargs.setdefault("lazy", True)
     graph, connected_components, dict_cluster = initialise(
-        path, psc_filenames, companies_filenames, string_ownership
+        path, psc_filenames, companies_filenames, string_ownership, **kwargs
     )
     # get indices where there are humans
     graphs_with_humans = [
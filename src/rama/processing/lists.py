@@ -47,6 +47,17 @@ psc_columns = [
     "address.postal_code",
 ]
 
+# Only read for corporate PSCs, to tell UK company numbers from foreign registration numbers
+psc_identification_columns = [
+    "identification.country_registered",
+    "identification.place_registered",
+]
+
+psc_dtypes = {column: str for column in psc_columns + psc_identification_columns} | {
+    "date_of_birth.year": "float64",
+    "date_of_birth.month": "float64",
+}
+
 psc_columns_rename = {
     "name": "CompanyName",
     "date_of_birth.year": "date_of_birth_year",
@@ -88,6 +99,19 @@ companies_columns = [
     "PreviousName_10.CompanyName",
 ]
 
+companies_api_columns = [
+    "company_number",
+    "company_name",
+    "date_of_creation",
+    "sic_codes",
+    "type",
+    "previous_company_names",
+    "registered_office_address.country",
+    "registered_office_address.postal_code",
+]
+
+companies_dtypes = {column: str for column in companies_columns + companies_api_columns}
+
 companies_columns_rename = {
     "PreviousName_1.CONDATE": "PreviousName_1_CONDATE",
     "PreviousName_1.CompanyName": "PreviousName_1_CompanyName",
@@ -121,3 +145,34 @@ natures_patterns_str = [
     "significant-influence-or-control",
     "voting-rights",
 ]
+
+uk_registries_pattern = (
+    r"\b(?:united kingdom|uk|great britain|england|wales|scotland|northern ireland)\b"
+    r"|companies house|registrar of companies"
+)
+
+legal_suffixes = {
+    "ltd": "limited",
+    "cyf": "cyfyngedig",
+    "public limited company": "plc",
+    "p.l.c": "plc",
+    "limited liability partnership": "llp",
+    "l.l.p": "llp",
+    "co": "company",
+}
+
+human_titles = [
+    "mr",
+    "mrs",
+    "ms",
+    "miss",
+    "mx",
+    "dr",
+    "prof",
+    "professor",
+    "sir",
+    "dame",
+    "lord",
+    "lady",
+    "rev",
+]
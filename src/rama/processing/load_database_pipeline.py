@@ -1,11 +1,13 @@
 """Loading and processing database functions"""
 
+import logging
 from typing import Sequence
 
 import networkx as nx
 import numpy as np
 import pandas as pd
 
+from rama.processing.array_graph import ArrayDiGraph
 from rama.processing.cleaning import clean_companies, clean_psc
 from rama.processing.helper_functions import (
     get_company_company_link,
@@ -19,31 +21,80 @@ from rama.processing.lists import (
     other_kinds,
     psc_columns,
 )
+from rama.processing.memory import compact_frames
+from rama.processing.natures import (
+    decode_ownership,
+    get_ownership_weights,
+    parse_natures_of_control,
+)
+from rama.processing.registry import EntityRegistry, stabilise_node_ids
+
+
+logger = logging.getLogger(__name__)
 
 
 def process_database(
     arr_psc: Sequence[pd.DataFrame],
     arr_companies: Sequence[pd.DataFrame],
     string_ownership: str = "ownership-of-shares",
+    compact: bool = False,
+    registry: EntityRegistry | None = None,
+    resolve_identities: bool = False,
+    resolve_companies: bool = False,
+    already_clean: bool = False,
 ) -> tuple:
-    """Function that processes the database and returns the dataframes and the edgelist."""
-    psc = clean_psc(arr_psc, string_ownership)
-    companies = clean_companies(arr_companies)
-
-    merged_firstlink, small_firstlink = get_firstlink(psc, companies)
-    psc_companies = get_secondlink(psc, companies, small_firstlink)
+    """Function that processes the database and returns the dataframes and the edgelist.
+    If compact is True, the dataframes use compact dtypes (categoricals, UInt32 node ids)
+    and a report of the bytes saved per dataframe is logged at the INFO level.
+    If a registry is given, node ids are replaced by its stable ids, assigning new ones
+    to entities not seen before.
+    If resolve_identities is True, spelling variants of the same human are merged.
+    If resolve_companies is True, company PSCs are matched to companies by registration
+    number and by current and previous names.
+    If already_clean is True, the parts were cleaned when they were read, see read_psc_part()
+    and read_companies_part(), and are only concatenated."""
+    psc = clean_psc(arr_psc, string_ownership, already_clean)
+    companies = clean_companies(arr_companies, already_clean)
+
+    if compact:
+        frames, report_cleaned = compact_frames({"psc": psc, "companies": companies})
+        psc, companies = frames["psc"], frames["companies"]
+
+    merged_firstlink, small_firstlink = get_firstlink(psc, companies, resolve_identities)
+    psc_companies = get_secondlink(psc, companies, small_firstlink, resolve_companies)
     sspsc = get_sspsc(psc, companies, small_firstlink, psc_companies)
 
-    list_dfs = [companies, merged_firstlink, psc_companies, sspsc]
+    if registry is not None:
+        small_firstlink, merged_firstlink, psc_companies, sspsc = stabilise_node_ids(
+            [small_firstlink, merged_firstlink, psc_companies, sspsc], registry, companies=companies
+        )
 
     edge_list = get_edge_list(small_firstlink, psc_companies, sspsc)
 
+    if compact:
+        frames, report_processed = compact_frames(
+            {
+                "merged_firstlink": merged_firstlink,
+                "psc_companies": psc_companies,
+                "sspsc": sspsc,
+                "edge_list": edge_list,
+            }
+        )
+        merged_firstlink, psc_companies = frames["merged_firstlink"], frames["psc_companies"]
+        sspsc, edge_list = frames["sspsc"], frames["edge_list"]
+        logger.info(
+            "Bytes saved by compact dtypes:\n%s", pd.concat([report_cleaned, report_processed])
+        )
+
+    list_dfs = [companies, merged_firstlink, psc_companies, sspsc]
+
     return list_dfs, edge_list
 
 
 def get_firstlink(
     psc: pd.DataFrame,
     companies: pd.DataFrame,
+    resolve_identities: bool = False,
 ) -> tuple:
     """Function that returns both DataFrames containing the firstlink"""
 
@@ -53,16 +104,17 @@ def get_firstlink(
         psc,
         companies,
         mutual_company_numbers,
-        psc_columns,
+        psc_columns + ["natures_mask"],
         human_kinds,
         companies_columns,
+        resolve_identities,
     )
-    merged_firstlink.natures_of_control = merged_firstlink.natures_of_control.apply(
-        lambda x: x.split("'")[1::2]
+    merged_firstlink.natures_of_control = parse_natures_of_control(
+        merged_firstlink.natures_of_control
     )
 
     small_firstlink = merged_firstlink[
-        ["name", "company_name", "company_number", "idx_human", "idx_company"]
+        ["name", "company_name", "company_number", "idx_human", "idx_company", "natures_mask"]
     ].copy()
     small_firstlink.loc[:, "company_name"] = small_firstlink.company_name.str.lower()
 
@@ -70,13 +122,16 @@ def get_firstlink(
 
 
 def get_secondlink(
-    psc: pd.DataFrame, companies: pd.DataFrame, small_firstlink: pd.DataFrame
+    psc: pd.DataFrame,
+    companies: pd.DataFrame,
+    small_firstlink: pd.DataFrame,
+    resolve_companies: bool = False,
 ) -> pd.DataFrame:
     """Return DataFrame containing second links"""
-    psc_companies = get_company_company_link(psc, companies, small_firstlink, company_kinds)
-    psc_companies.natures_of_control = psc_companies.natures_of_control.apply(
-        lambda x: x.split("'")[1::2]
+    psc_companies = get_company_company_link(
+        psc, companies, small_firstlink, company_kinds, resolve_companies
     )
+    psc_companies.natures_of_control = parse_natures_of_control(psc_companies.natures_of_control)
 
     return psc_companies
 
@@ -87,92 +142,71 @@ def get_sspsc(
     small_firstlink: pd.DataFrame,
     psc_companies: pd.DataFrame,
 ) -> pd.DataFrame:
-    """Function to get links coming from SSPSCs"""
-    sspsc = psc.loc[psc.kind.isin(other_kinds)].copy()
-    company_numbers_sspsc = sspsc.company_number.unique()
-
-    df_names = companies.loc[
-        companies.company_number.isin(company_numbers_sspsc),
-        ["company_number", "company_name"],
-    ]
-    company_names_sspsc = df_names.company_name.unique()
+    """Function to get links coming from SSPSCs.
+    The company of every SSPSC is found in a single lookup: by company number in
+    small_firstlink and psc_companies, then by the name of the owning company in psc_companies,
+    the first match winning. Companies not found get a new index each."""
+    sspsc = psc.loc[psc.kind.isin(other_kinds)].reset_index(drop=True)
 
-    sspsc = (
-        sspsc.set_index("company_number").join(df_names.set_index("company_number")).reset_index()
-    )
+    company_names = companies.drop_duplicates("company_number").set_index("company_number")
+    sspsc["company_name"] = sspsc.company_number.map(company_names.company_name)
 
     min_ = int(psc_companies["idx_company_2"].max())
     max_ = min_ + len(sspsc)
-    idxs = [i + 1 for i in range(min_, max_)]
-
-    sspsc.loc[:, "i"] = idxs
+    sspsc["i"] = np.arange(min_ + 1, max_ + 1)
 
-    a = small_firstlink.loc[small_firstlink.company_number.isin(company_numbers_sspsc)]
-    b = psc_companies.loc[psc_companies.company_number.isin(company_numbers_sspsc)]
-    c = psc_companies.loc[psc_companies.company_name.isin(company_names_sspsc)]
-    d = psc_companies.loc[psc_companies.company_name_2.isin(company_names_sspsc)]
-
-    for df in [a, b]:
-        if len(df) > 0:
-            sspsc = (
-                sspsc.set_index("company_number")
-                .join(df.set_index("company_number")["idx_company"].drop_duplicates())
-                .reset_index()
-            )
-
-    for df in [c, d]:
-        if len(df) > 0:
-            sspsc = (
-                sspsc.set_index("company_name")
-                .join(df.set_index("company_name")["idx_company"].drop_duplicates())
-                .reset_index()
+    # Earlier keys take priority when a company is found in several places
+    keys = pd.concat(
+        [
+            pd.DataFrame({"key": "number:" + df.company_number, "idx_company": df.idx_company})
+            for df in [small_firstlink, psc_companies]
+        ]
+        + [
+            pd.DataFrame(
+                {
+                    "key": "name:" + psc_companies.company_name,
+                    "idx_company": psc_companies.idx_company,
+                }
             )
-
-    if "idx_company" not in sspsc.columns:
-        sspsc["idx_company"] = np.nan
-
-    duplicated_companies = sspsc.loc[sspsc.idx_company.isna(), :].duplicated(
-        subset="company_number"
-    )
-    all_duplicated_companies = sspsc.loc[sspsc.idx_company.isna(), :].duplicated(
-        subset="company_number", keep=False
+        ]
     )
+    lookup = keys.dropna().drop_duplicates("key").set_index("key").idx_company
 
-    companies_bool = np.logical_or(duplicated_companies, ~all_duplicated_companies)
-
-    s = sspsc.loc[~sspsc.idx_company.isna(), :].idx_company.isna()
-    companies_bool = pd.concat([companies_bool, s]).sort_index()
+    idxs_number = ("number:" + sspsc.company_number).map(lookup)
+    idxs_name = ("name:" + sspsc.company_name).map(lookup)
+    sspsc["idx_company"] = idxs_number.fillna(idxs_name).astype(float)
 
-    idx_nan = sspsc.drop_duplicates("company_number").idx_company.isna()
-
-    min_ = max_
-    max_ = min_ + sum(idx_nan)
-    idxs = [i + 1 for i in range(min_, max_)]
-
-    sspsc.loc[companies_bool.values, ["idx_company"]] = idxs
-    sspsc["idx_company"].fillna(
-        sspsc.groupby("company_number")["idx_company"].transform("first"), inplace=True
+    # Companies not found are indexed in order of their last SSPSC
+    idxs_nan = sspsc.idx_company.isna()
+    last_nan = idxs_nan & ~sspsc.company_number.duplicated(keep="last")
+    idxs = pd.Series(
+        np.arange(max_ + 1, max_ + 1 + last_nan.sum()), index=sspsc.company_number[last_nan]
     )
+    sspsc.loc[idxs_nan, "idx_company"] = sspsc.company_number[idxs_nan].map(idxs)
 
-    return sspsc
+    columns = ["company_number"] + sspsc.columns.drop("company_number").to_list()
+
+    return sspsc[columns]
 
 
 def get_edge_list(
     small_firstlink: pd.DataFrame, psc_companies: pd.DataFrame, sspsc: pd.DataFrame
 ) -> pd.DataFrame:
-    """Function to get the edgelist"""
+    """Function to get the edgelist.
+    Each row also gets the natures of control bitmask and the ownership weight of its edge,
+    taken from the first row of the edge. SSPSC edges have no natures and get NaN."""
     edge_list_companies = (
-        psc_companies[["idx_company", "idx_company_2"]]
+        psc_companies[["idx_company", "idx_company_2", "natures_mask"]]
         .copy()
         .rename(columns={"idx_company": "i", "idx_company_2": "j"})
-        .astype(int)
+        .astype({"i": int, "j": int})
     )
 
     edge_list_humans = (
-        small_firstlink[["idx_human", "idx_company"]]
+        small_firstlink[["idx_human", "idx_company", "natures_mask"]]
         .copy()
         .rename(columns={"idx_human": "i", "idx_company": "j"})
-        .astype(int)
+        .astype({"i": int, "j": int})
     )
 
     edge_list_sspsc = (
@@ -187,15 +221,70 @@ def get_edge_list(
         ]
     ).reset_index()
 
+    edge_list["natures_mask"] = (
+        edge_list.groupby(["i", "j"]).natures_mask.transform("first").astype("UInt32")
+    )
+    edge_list["weight"] = get_edge_weights(edge_list.natures_mask)
+
     return edge_list
 
 
-def get_graph(edge_list: pd.DataFrame) -> nx.DiGraph:
-    """Function that takes the edgelist and returns a nx.DiGraph"""
+def get_edge_weights(natures_mask: pd.Series) -> np.ndarray:
+    """Function to get the ownership weight of each row of the edgelist from its bitmask.
+    Rows without a bitmask, or with ownership bands of different weights, get NaN."""
+    has_mask = natures_mask.notna().to_numpy()
+    weights = np.full(len(natures_mask), np.nan)
+    weights[has_mask] = get_ownership_weights(natures_mask[has_mask])
+
+    return weights
+
+
+def get_edge_ownership(natures_mask: pd.Series) -> np.ndarray:
+    """Function to get the list of types of ownership of each row of the edgelist.
+    Rows without a bitmask get NaN."""
+    has_mask = natures_mask.notna().to_numpy()
+    ownership = np.full(len(natures_mask), np.nan, dtype=object)
+    ownership[has_mask] = pd.Series(
+        decode_ownership(natures_mask[has_mask]), dtype=object
+    ).to_numpy()
+
+    return ownership
+
+
+def get_graph(edge_list: pd.DataFrame, backend: str = "networkx") -> nx.DiGraph | ArrayDiGraph:
+    """Function that takes the edgelist and returns a nx.DiGraph.
+    With backend="array", it returns an ArrayDiGraph built from the edgelist arrays instead.
+    The ownership and weight edge attributes are set from the edgelist columns in bulk."""
+    has_attributes = "natures_mask" in edge_list.columns
+    if has_attributes:
+        has_mask = edge_list.natures_mask.notna().to_numpy()
+        ownership = get_edge_ownership(edge_list.natures_mask)
+        weights = edge_list.weight.to_numpy()
+
+    if backend == "array":
+        graph = ArrayDiGraph.from_edge_list(edge_list)
+        if has_attributes:
+            positions = graph.get_edge_positions(edge_list.i.values, edge_list.j.values)
+            for name, values in [("ownership", ownership), ("weight", weights)]:
+                edge_values = np.full(graph.number_of_edges(), np.nan, dtype=values.dtype)
+                edge_values[positions[has_mask]] = values[has_mask]
+                graph.set_edge_attributes(edge_values, name)
+        return graph
+    if backend != "networkx":
+        raise ValueError(f"Unknown graph backend: {backend}")
+
     origins = [int(i) for i in edge_list.i.values]
     destinations = [int(j) for j in edge_list.j.values]
-    edge_list_ints = list(zip(origins, destinations))
 
-    graph = nx.from_edgelist(edge_list_ints, create_using=nx.DiGraph)
+    if not has_attributes:
+        return nx.from_edgelist(list(zip(origins, destinations)), create_using=nx.DiGraph)
+
+    # Edges without natures of control, e.g. SSPSC edges, get no attributes
+    edge_data = [
+        {"ownership": edge_ownership, "weight": weight} if mask else {}
+        for edge_ownership, weight, mask in zip(ownership, weights, has_mask)
+    ]
+    graph = nx.DiGraph()
+    graph.add_edges_from(zip(origins, destinations, edge_data))
 
     return graph
@@ -0,0 +1,64 @@
+"""Compact dtypes functions"""
+
+import numpy as np
+import pandas as pd
+
+
+categorical_columns = [
+    "kind",
+    "nationality",
+    "country_of_residence",
+    "address.country",
+    "ceased",
+    "CompanyCategory",
+    "CompanyStatus",
+    "CountryOfOrigin",
+    "type",
+    "registered_office_address.country",
+]
+
+node_id_columns = ["idx_human", "idx_company", "idx_company_2", "i", "j"]
+
+date_part_dtypes = {
+    "date_of_birth.year": "UInt16",
+    "date_of_birth.month": "UInt8",
+}
+
+
+def get_memory_usage(df: pd.DataFrame) -> int:
+    """Function to get the number of bytes used by a DataFrame, including its strings"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Function to convert the columns of a DataFrame to compact dtypes.
+    Low-cardinality strings become categoricals, node ids nullable UInt32
+    and the date of birth parts nullable UInt16/UInt8."""
+    dtypes = {}
+    for column in df.columns:
+        if column in categorical_columns and df[column].dtype == object:
+            dtypes[column] = "category"
+        elif column in node_id_columns:
+            dtypes[column] = "UInt32" if df[column].isna().any() else np.uint32
+        elif column in date_part_dtypes:
+            dtypes[column] = date_part_dtypes[column]
+
+    return df.astype(dtypes)
+
+
+def compact_frames(frames: dict) -> tuple:
+    """Function to convert a dictionary of DataFrames to compact dtypes.
+    Returns the converted DataFrames and a report of the bytes saved per DataFrame."""
+    compacted = {}
+    report = []
+    for name, df in frames.items():
+        compacted[name] = compact_dtypes(df)
+        bytes_before = get_memory_usage(df)
+        bytes_after = get_memory_usage(compacted[name])
+        report.append([name, bytes_before, bytes_after, bytes_before - bytes_after])
+
+    df_report = pd.DataFrame(
+        report, columns=["frame", "bytes_before", "bytes_after", "bytes_saved"]
+    ).set_index("frame")
+
+    return compacted, df_report
@@ -0,0 +1,105 @@
+"""Natures of control bitmask functions"""
+
+import numpy as np
+import pandas as pd
+
+from rama.processing.lists import natures_patterns_str, types_of_ownership
+
+
+# Bits 0-9 are the exact types of ownership, bits 10-17 the patterns contained in a nature
+natures_vocabulary = types_of_ownership + natures_patterns_str
+
+ownership_bits = (1 << len(types_of_ownership)) - 1
+
+dict_weights_translate = {
+    "more-than-25": 0.25,
+    "25-to-50": 0.25,
+    "50-to-75": 0.5,
+    "75-to-100": 0.75,
+}
+
+
+def split_natures_of_control(natures: str) -> list:
+    """Function to get the list of natures from its string repr"""
+    return natures.split("'")[1::2]
+
+
+def get_nature_bits(nature: str) -> int:
+    """Function to get the bits of a single nature of control"""
+    bits = 0
+    for bit, type_of_ownership in enumerate(types_of_ownership):
+        if nature == type_of_ownership:
+            bits |= 1 << bit
+    for bit, pattern in enumerate(natures_patterns_str, start=len(types_of_ownership)):
+        if pattern in nature:
+            bits |= 1 << bit
+    return bits
+
+
+def parse_natures_of_control(natures: pd.Series) -> pd.Series:
+    """Function to parse the string repr of the natures of control into lists.
+    Each distinct string is parsed once and mapped back to the rows."""
+    codes, uniques = pd.factorize(natures)
+    parsed = np.empty(len(uniques) + 1, dtype=object)
+    parsed[:-1] = [split_natures_of_control(str(unique)) for unique in uniques]
+    parsed[-1] = []
+
+    return pd.Series(parsed[codes], index=natures.index, name=natures.name)
+
+
+def encode_natures_of_control(natures: pd.Series) -> np.ndarray:
+    """Function to encode the string repr of the natures of control as a uint32 bitmask.
+    Each distinct string is decoded once and mapped back to the rows."""
+    codes, uniques = pd.factorize(natures)
+    masks = np.zeros(len(uniques) + 1, dtype=np.uint32)
+    for code, unique in enumerate(uniques):
+        for nature in split_natures_of_control(str(unique)):
+            masks[code] |= get_nature_bits(nature)
+
+    return masks[codes]
+
+
+def contains_nature(natures: pd.Series, string_ownership: str) -> np.ndarray:
+    """Function to check which natures of control strings contain string_ownership.
+    Each distinct string is checked once and mapped back to the rows."""
+    codes, uniques = pd.factorize(natures)
+    contains = np.zeros(len(uniques) + 1, dtype=bool)
+    contains[:-1] = [string_ownership in str(unique) for unique in uniques]
+
+    return contains[codes]
+
+
+def decode_ownership(masks: np.ndarray | pd.Series) -> list:
+    """Function to get the list of types of ownership set in each mask"""
+    masks = np.asarray(masks, dtype=np.uint32) & ownership_bits
+    unique_masks, inverse = np.unique(masks, return_inverse=True)
+    lists = [
+        [nature for bit, nature in enumerate(types_of_ownership) if mask >> bit & 1]
+        for mask in unique_masks
+    ]
+
+    return [lists[i] for i in inverse.ravel()]
+
+
+def get_ownership_weights(masks: np.ndarray | pd.Series) -> np.ndarray:
+    """Function to get the weight of each mask from its ownership band.
+    Masks without a band, or with bands of different weights, get NaN."""
+    masks = np.asarray(masks, dtype=np.uint32)
+
+    band_weights = np.array(
+        [
+            next(value for key, value in dict_weights_translate.items() if key in nature)
+            for nature in types_of_ownership
+        ]
+    )
+    weights = np.unique(band_weights)
+
+    has_weight = np.zeros((len(masks), len(weights)), dtype=bool)
+    for w, weight in enumerate(weights):
+        bits = sum(1 << bit for bit in np.where(band_weights == weight)[0])
+        has_weight[:, w] = (masks & bits) != 0
+
+    n_weights = has_weight.sum(axis=1)
+    single_weight = (has_weight * weights).sum(axis=1)
+
+    return np.where(n_weights == 1, single_weight, np.nan)
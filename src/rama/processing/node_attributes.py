@@ -1,55 +1,133 @@
 """Setting node attributes dictionary functions"""
 
+from collections.abc import Sequence
+
 import networkx as nx
 import numpy as np
 import pandas as pd
 
-from rama.processing.lists import types_of_ownership
+from rama.processing.array_graph import ArrayDiGraph
+
+
+category_attributes = ["kind"]
+company_attributes = ["date_of_creation", "sic_codes", "type", "previous_company_names"]
 
 
 # Main function
 
 
 def set_attributes(
-    graph: nx.DiGraph,
+    graph: nx.DiGraph | ArrayDiGraph,
     merged_firstlink: pd.DataFrame,
     psc_companies: pd.DataFrame,
     companies: pd.DataFrame,
+    node_dicts: bool = False,
 ) -> None:
-    """Function that sets the attributes described in this script to the graph."""
-    human_dict = attr_human(graph, merged_firstlink)
-    leaf_dict = attr_leaf(graph, merged_firstlink, psc_companies)
-    name_dict = attr_name(graph, merged_firstlink, psc_companies)
-    kind_dict = attr_kind(graph, merged_firstlink, psc_companies)
-    company_numbers_dict = attr_company_numbers(graph, merged_firstlink, psc_companies, companies)
-    date_of_creation_dict = attr_date_of_creation(graph, merged_firstlink, psc_companies, companies)
-    sic_dict = attr_sic_codes(graph, merged_firstlink, psc_companies, companies)
-    country_dict, postal_code_dict = attr_address(graph, merged_firstlink, psc_companies, companies)
-    ownership_dict = get_nature_of_ownership_dict(merged_firstlink, psc_companies)
-
-    dict_indegree = dict([(node, in_degree) for (node, in_degree) in graph.in_degree])
-    dict_outdegree = dict([(node, out_degree) for (node, out_degree) in graph.out_degree])
-
-    nx.set_node_attributes(graph, human_dict, "human")
-    nx.set_node_attributes(graph, leaf_dict, "leaf")
-    nx.set_node_attributes(graph, name_dict, "name")
-    nx.set_node_attributes(graph, company_numbers_dict, "company_number")
-    nx.set_node_attributes(graph, date_of_creation_dict, "date_of_creation")
-    nx.set_node_attributes(graph, kind_dict, "kind")
-    nx.set_node_attributes(graph, sic_dict, "sic_codes")
-    nx.set_node_attributes(graph, country_dict, "country")
-    nx.set_node_attributes(graph, postal_code_dict, "postal_code")
-
-    nx.set_edge_attributes(graph, ownership_dict, "ownership")
-
-    dict_weights = get_weight_dict(graph)
-    nx.set_edge_attributes(graph, dict_weights, "weight")
-
-    nx.set_node_attributes(graph, dict_indegree, "in_degree")
-    nx.set_node_attributes(graph, dict_outdegree, "out_degree")
+    """Function that sets the node attributes described in this script to the graph.
+    The graph can be a nx.DiGraph or an ArrayDiGraph. Edge attributes are set by get_graph.
+    See set_node_table() for node_dicts."""
+    nodes = get_sorted_nodes(graph)
+
+    # Company nodes are resolved to a company number once, then joined with companies once
+    node_numbers = get_node_company_numbers(merged_firstlink, psc_companies, companies)
+    company_table = get_company_table(node_numbers, companies, nodes)
+
+    node_lists = get_address_lists(nodes, merged_firstlink, psc_companies, companies)
+
+    node_table = pd.DataFrame(
+        {
+            "human": get_human_column(nodes, merged_firstlink),
+            "leaf": get_leaf_column(nodes, merged_firstlink, psc_companies),
+            "name": get_name_column(nodes, merged_firstlink, psc_companies),
+            "company_number": get_last_values(node_numbers, nodes).company_number,
+            "date_of_creation": get_date_column(company_table.date_of_creation),
+            "kind": get_kind_column(nodes, merged_firstlink, psc_companies),
+            "sic_codes": company_table.sic_codes,
+            "type": company_table.get("type", np.nan),
+            "previous_company_names": company_table.get("previous_company_names", np.nan),
+            "in_degree": pd.Series(dict(graph.in_degree), dtype=np.int64),
+            "out_degree": pd.Series(dict(graph.out_degree), dtype=np.int64),
+        },
+        index=nodes,
+    )
+    node_table = node_table.infer_objects().astype(
+        {column: "category" for column in category_attributes}
+    )
+    set_node_table(graph, node_table, node_dicts, node_lists)
 
 
 # Auxiliary functions
+def set_node_table(
+    graph: nx.DiGraph | ArrayDiGraph,
+    node_table: pd.DataFrame,
+    node_dicts: bool = False,
+    node_lists: dict | None = None,
+) -> None:
+    """Function to attach a node table, one column per attribute and indexed by node, to a graph.
+    The table is stored in graph.graph["node_table"], and the NodeValueLists of node_lists,
+    aligned with its index, in graph.graph["node_lists"]. An ArrayDiGraph also gets them as
+    node attribute arrays. A nx.DiGraph only gets them as per-node dictionaries if node_dicts
+    is True, for code that reads graph.nodes[node] directly."""
+    graph.graph["node_table"] = node_table
+    node_lists = node_lists or {}
+    graph.graph["node_lists"] = node_lists
+
+    if isinstance(graph, ArrayDiGraph):
+        positions = node_table.index.get_indexer(graph.node_ids)
+        for column in node_table.columns:
+            graph.set_node_attributes(node_table[column].to_numpy()[positions], column)
+        for column, lists in node_lists.items():
+            graph.node_data[column] = lists[positions]
+    elif node_dicts:
+        nx.set_node_attributes(
+            graph, get_nodes_attributes(graph, node_table.index).to_dict("index")
+        )
+
+
+def get_node_table(graph: nx.DiGraph | ArrayDiGraph) -> pd.DataFrame:
+    """Function to get the node table of a graph.
+    Graphs without one, e.g. modified copies, get a table built from their node attributes."""
+    if "node_table" in graph.graph:
+        return graph.graph["node_table"]
+
+    return pd.DataFrame.from_dict(dict(graph.nodes(data=True)), orient="index")
+
+
+def get_nodes_attributes(
+    graph: nx.DiGraph | ArrayDiGraph, list_nodes: Sequence[int], columns: list | None = None
+) -> pd.DataFrame:
+    """Function to get the attributes of some nodes as a table, with a single lookup.
+    The lists of values in graph.graph["node_lists"] are only expanded for these nodes."""
+    node_table = get_node_table(graph)
+    node_lists = graph.graph.get("node_lists", {}) if "node_table" in graph.graph else {}
+    if columns is None:
+        columns = list(node_table.columns) + list(node_lists)
+
+    attributes = node_table.loc[
+        list_nodes, [column for column in columns if column not in node_lists]
+    ]
+    if any(column in node_lists for column in columns):
+        positions = node_table.index.get_indexer(list_nodes)
+        for column in columns:
+            if column in node_lists:
+                attributes[column] = pd.Series(
+                    node_lists[column][positions].to_lists(), dtype=object
+                ).to_numpy()
+
+    return attributes[columns]
+
+
+def get_node_attribute(graph: nx.DiGraph | ArrayDiGraph, node: int, column: str):
+    """Function to get one attribute of one node, from the node table if the graph has one"""
+    if "node_table" in graph.graph:
+        node_lists = graph.graph.get("node_lists", {})
+        if column in node_lists:
+            return node_lists[column][graph.graph["node_table"].index.get_loc(node)]
+        return graph.graph["node_table"].at[node, column]
+
+    return graph.nodes[node][column]
+
+
 def get_company_numbers(
     psc_companies: pd.DataFrame, df_attr: pd.DataFrame, companies: pd.DataFrame
 ) -> pd.DataFrame:
@@ -75,132 +153,107 @@ def get_company_numbers(
     return df_filtered
 
 
-def get_dict_from_attr_for_companies(
-    attr: str,
-    graph: nx.DiGraph,
-    merged_firstlink: pd.DataFrame,
-    psc_companies: pd.DataFrame,
-    companies: pd.DataFrame,
-    company_number: str = "company_number",
-) -> dict:
-    """General function to return attribute dictionary for companies."""
-
-    df1 = psc_companies.copy().set_index("idx_company_2")[[company_number]]
-    df2 = merged_firstlink.copy().set_index("idx_company")[[company_number]]
-
-    df1.index = df1.index.astype(int)
-    df2.index = df2.index.astype(int)
+def get_sorted_nodes(graph: nx.DiGraph | ArrayDiGraph) -> pd.Index:
+    """Function to get the sorted nodes of a graph, used as index of the node table"""
+    return pd.Index(sorted(graph.nodes), dtype=np.int64)
 
-    df_attr = pd.concat([df1, df2])
-    df_attr = df_attr.drop_duplicates()
 
-    df_filtered = get_company_numbers(psc_companies, df_attr, companies)
-    df_filtered = df_filtered.set_index("idx_company")[[company_number]]
-    df_filtered.index = df_filtered.index.astype(int)
-
-    df_attr = pd.concat([df_attr, df_filtered]).drop_duplicates()
-
-    companies_attr = companies[[company_number, attr]].set_index(company_number)
-    df_attr = df_attr.reset_index().set_index(company_number).join(companies_attr)
-    df_attr = df_attr.set_index("index")
-
-    set_nodes = set(sorted(list(graph.nodes())))
-    set_index = set(df_attr.index.values)
-
-    indices_non_appearing = list(set_index.symmetric_difference(set_nodes))
+def get_last_values(df_attr: pd.DataFrame, nodes: pd.Index) -> pd.DataFrame:
+    """Function to align attribute rows, indexed by node, with the nodes of a graph.
+    When a node has several rows the last one is kept, and nodes without rows get NaN."""
+    df_attr = df_attr[~df_attr.index.duplicated(keep="last")]
 
-    df_non = pd.DataFrame(index=indices_non_appearing)
-    df_non[attr] = np.nan
+    return df_attr.reindex(nodes)
 
-    df_final = pd.concat([df_attr, df_non])
-    attr_dict = df_final.to_dict()[attr]
-
-    return attr_dict
 
+def get_node_company_numbers(
+    merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame, companies: pd.DataFrame
+) -> pd.DataFrame:
+    """Function to resolve the company numbers of the company nodes in a single step.
+    Owned companies take the number of their links, and companies only placed on the first
+    column of psc_companies are found by name. Returns the node to company number rows in order."""
+    df1 = psc_companies.set_index("idx_company_2")[["company_number"]]
+    df2 = merged_firstlink.set_index("idx_company")[["company_number"]]
 
-def attr_kind(
-    graph: nx.DiGraph, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
-) -> dict:
-    """Returns a dictionary with the psc's kind.
-    The dictionary is expected to be passed to nx.set_node_attributes()"""
-    attr = "kind"
-    if attr in psc_companies.columns and attr in merged_firstlink.columns:
-        df1 = psc_companies.set_index("idx_company")[[attr]]
-        df2 = merged_firstlink.set_index("idx_company")[[attr]]
+    df1.index = df1.index.astype(int)
+    df2.index = df2.index.astype(int)
 
-        df1.index = df1.index.astype(int)
-        df2.index = df2.index.astype(int)
+    df_numbers = pd.concat([df1, df2])
+    df_numbers = df_numbers.drop_duplicates()
 
-        df_attr = pd.concat([df1, df2])
+    df_filtered = get_company_numbers(psc_companies, df_numbers, companies)
+    df_filtered = df_filtered.set_index("idx_company")[["company_number"]]
+    df_filtered.index = df_filtered.index.astype(int)
 
-        set_nodes = set(sorted(list(graph.nodes())))
-        set_index = set(df_attr.index.values)
+    return pd.concat([df_numbers, df_filtered])
 
-        indices_non_appearing = list(set_index.symmetric_difference(set_nodes))
 
-        df_non = pd.DataFrame(index=indices_non_appearing)
-        df_non[attr] = np.nan
+def get_company_table(
+    node_numbers: pd.DataFrame,
+    companies: pd.DataFrame,
+    nodes: pd.Index,
+    columns: list | None = None,
+) -> pd.DataFrame:
+    """Function to get the attributes of the company nodes with a single join on company number.
+    Each company number is only joined to the first node it was resolved to."""
+    if columns is None:
+        columns = company_attributes
+    columns = [column for column in columns if column in companies.columns]
+
+    companies_attr = companies.set_index("company_number")[columns]
+    df_attr = (
+        node_numbers.drop_duplicates()
+        .rename_axis("node")
+        .reset_index()
+        .set_index("company_number")
+        .join(companies_attr)
+        .set_index("node")
+    )
 
-        df_final = pd.concat([df_attr, df_non])
+    return get_last_values(df_attr[columns], nodes)
 
-        attr_dict = df_final.to_dict()[attr]
-        return attr_dict
-    return {}
 
+def get_date_column(dates: pd.Series, format_date: str = "%Y-%m-%d") -> pd.Series:
+    """Function to parse the dates of creation once, as datetime64 with NaT for missing dates"""
+    return pd.to_datetime(dates, format=format_date)
 
-# Attribute dictionaries
-def attr_human(graph: nx.DiGraph, merged_firstlink: pd.DataFrame) -> dict:
-    """Returns a dictionary which answers the question 'is the node a human?'.
-    The dictionary is expected to be passed to nx.set_node_attributes()"""
 
+def get_human_column(nodes: pd.Index, merged_firstlink: pd.DataFrame) -> pd.Series:
+    """Function to get which nodes are humans"""
     human_nodes = merged_firstlink.idx_human.astype(int).unique()
-    human_df = pd.DataFrame(index=sorted(list(graph.nodes())))
-    human_df["human"] = False
-    human_df.loc[human_nodes, "human"] = True
-    human_dict = human_df.to_dict()["human"]
 
-    return human_dict
+    return pd.Series(nodes.isin(human_nodes), index=nodes, name="human")
 
 
-def attr_leaf(
-    graph: nx.DiGraph, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
-) -> dict:
-    """Returns a dictionary which answers the question 'is the node a leaf?'.
-    The dictionary is expected to be passed to nx.set_node_attributes()"""
-
-    owned_nodes_by_humans = merged_firstlink.idx_company.astype(int).unique()
+def get_leaf_column(
+    nodes: pd.Index, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
+) -> pd.Series:
+    """Function to get which nodes are leaves, i.e. owned companies that own nothing"""
+    owned_nodes = np.concatenate(
+        [
+            merged_firstlink.idx_company.astype(int).unique(),
+            psc_companies.idx_company_2.astype(int).unique(),
+        ]
+    )
     owners = psc_companies.idx_company.astype(int).unique()
-    owned_nodes_by_companies = psc_companies.idx_company_2.astype(int).unique()
-
-    leafs1 = [node for node in owned_nodes_by_humans if node not in owners]
-    leafs2 = [node for node in owned_nodes_by_companies if node not in owners]
-    leafs = leafs1 + leafs2
+    leafs = owned_nodes[~np.isin(owned_nodes, owners)]
 
-    leaf_df = pd.DataFrame(index=sorted(list(graph.nodes())))
-    leaf_df["leaf"] = False
-    leaf_df.loc[leafs, "leaf"] = True
-    dummy_dict = leaf_df.to_dict()
-    leaf_dict = dummy_dict["leaf"]
+    return pd.Series(nodes.isin(leafs), index=nodes, name="leaf")
 
-    return leaf_dict
 
-
-def attr_name(
-    graph: nx.DiGraph, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
-) -> dict:
-    """Returns a dictionary with the nodes' names.
-    The dictionary is expected to be passed to nx.set_node_attributes()"""
+def get_name_column(
+    nodes: pd.Index, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
+) -> pd.Series:
+    """Function to get the names of the nodes"""
     attr = "name"
     attr2 = "company_name"
 
     df1 = psc_companies.set_index("idx_company")[[attr2]].rename(columns={attr2: attr})
     df2 = psc_companies.set_index("idx_company_2")[[attr2 + "_2"]].rename(
-        columns={attr2 + "_2": attr}, index={"idx_company_2": "idx_company"}
+        columns={attr2 + "_2": attr}
     )
     df3 = merged_firstlink.set_index("idx_company")[[attr2]].rename(columns={attr2: attr})
-    df4 = merged_firstlink.set_index("idx_human")[[attr]].rename(
-        index={"idx_company_2": "idx_company"}
-    )
+    df4 = merged_firstlink.set_index("idx_human")[[attr]]
 
     list_dfs = [df1, df2, df3, df4]
 
@@ -210,56 +263,86 @@ def attr_name(
     df_attr = pd.concat(list_dfs)
     df_attr = df_attr.drop_duplicates()
 
-    set_nodes = set(sorted(list(graph.nodes())))
-    set_index = set(df_attr.index.values)
+    return get_last_values(df_attr, nodes)[attr]
 
-    indices_non_appearing = list(set_index.symmetric_difference(set_nodes))
 
-    df_non = pd.DataFrame(index=indices_non_appearing)
-    df_non[attr] = np.nan
+def get_kind_column(
+    nodes: pd.Index, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
+) -> pd.Series:
+    """Function to get the psc's kind of the nodes, NaN when the data has no kind"""
+    attr = "kind"
+    if attr not in psc_companies.columns or attr not in merged_firstlink.columns:
+        return pd.Series(np.nan, index=nodes, dtype=object, name=attr)
 
-    df_final = pd.concat([df_attr, df_non])
+    df1 = psc_companies.set_index("idx_company")[[attr]]
+    df2 = merged_firstlink.set_index("idx_company")[[attr]]
 
-    attr_dict = df_final.to_dict()[attr]
-    return attr_dict
+    df1.index = df1.index.astype(int)
+    df2.index = df2.index.astype(int)
+
+    df_attr = pd.concat([df1, df2])
 
+    return get_last_values(df_attr, nodes)[attr]
 
-def attr_company_numbers(
+
+def get_dict_from_attr_for_companies(
+    attr: str,
     graph: nx.DiGraph,
     merged_firstlink: pd.DataFrame,
     psc_companies: pd.DataFrame,
     companies: pd.DataFrame,
 ) -> dict:
-    """Returns a dictionary with the company numbers of the company nodes.
+    """General function to return attribute dictionary for companies."""
+    node_numbers = get_node_company_numbers(merged_firstlink, psc_companies, companies)
+    company_table = get_company_table(node_numbers, companies, get_sorted_nodes(graph), [attr])
+
+    return company_table[attr].to_dict()
+
+
+def attr_kind(
+    graph: nx.DiGraph, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
+) -> dict:
+    """Returns a dictionary with the psc's kind.
     The dictionary is expected to be passed to nx.set_node_attributes()"""
-    attr = "company_number"
-    df1 = psc_companies.set_index("idx_company_2")[[attr]].rename(
-        index={"idx_company_2": "idx_company"}
-    )
-    df2 = merged_firstlink.set_index("idx_company")[[attr]]
+    if "kind" in psc_companies.columns and "kind" in merged_firstlink.columns:
+        return get_kind_column(get_sorted_nodes(graph), merged_firstlink, psc_companies).to_dict()
+    return {}
 
-    df1.index = df1.index.astype(int)
-    df2.index = df2.index.astype(int)
 
-    df_attr = pd.concat([df1, df2])
-    df_attr = df_attr.drop_duplicates()
+# Attribute dictionaries
+def attr_human(graph: nx.DiGraph, merged_firstlink: pd.DataFrame) -> dict:
+    """Returns a dictionary which answers the question 'is the node a human?'.
+    The dictionary is expected to be passed to nx.set_node_attributes()"""
+    return get_human_column(get_sorted_nodes(graph), merged_firstlink).to_dict()
 
-    df_filtered = get_company_numbers(psc_companies, df_attr, companies)
-    df_attr = pd.concat([df_attr, df_filtered.set_index("idx_company")["company_number"]])
 
-    set_nodes = set(sorted(list(graph.nodes())))
-    set_index = set(df_attr.index.values)
+def attr_leaf(
+    graph: nx.DiGraph, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
+) -> dict:
+    """Returns a dictionary which answers the question 'is the node a leaf?'.
+    The dictionary is expected to be passed to nx.set_node_attributes()"""
+    return get_leaf_column(get_sorted_nodes(graph), merged_firstlink, psc_companies).to_dict()
 
-    indices_non_appearing = list(set_index.symmetric_difference(set_nodes))
 
-    df_non = pd.DataFrame(index=indices_non_appearing)
-    df_non[attr] = np.nan
+def attr_name(
+    graph: nx.DiGraph, merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
+) -> dict:
+    """Returns a dictionary with the nodes' names.
+    The dictionary is expected to be passed to nx.set_node_attributes()"""
+    return get_name_column(get_sorted_nodes(graph), merged_firstlink, psc_companies).to_dict()
 
-    df_final = pd.concat([df_attr, df_non])
 
-    attr_dict = df_final.to_dict()[attr]
+def attr_company_numbers(
+    graph: nx.DiGraph,
+    merged_firstlink: pd.DataFrame,
+    psc_companies: pd.DataFrame,
+    companies: pd.DataFrame,
+) -> dict:
+    """Returns a dictionary with the company numbers of the company nodes.
+    The dictionary is expected to be passed to nx.set_node_attributes()"""
+    node_numbers = get_node_company_numbers(merged_firstlink, psc_companies, companies)
 
-    return attr_dict
+    return get_last_values(node_numbers, get_sorted_nodes(graph)).company_number.to_dict()
 
 
 def attr_previous_names(
@@ -326,16 +409,11 @@ def attr_sic_codes(
     return attr_dict
 
 
-def attr_address(
-    graph: nx.DiGraph,
-    merged_firstlink: pd.DataFrame,
-    psc_companies: pd.DataFrame,
-    companies: pd.DataFrame,
-) -> tuple:
-    """Returns two dictionaries with the addresses of nodes.
-    One for the registered country and another for the registered postal code.
-    The dictionary is expected to be passed to nx.set_node_attributes()"""
-
+def get_addresses(
+    merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame, companies: pd.DataFrame
+) -> pd.DataFrame:
+    """Function to get the address rows of the nodes, indexed by node.
+    PSCs use their own address and owned companies which are not PSCs their registered office."""
     psc_country = "address.country"
     psc_postal_code = "address.postal_code"
 
@@ -365,7 +443,7 @@ def attr_address(
     j_psc_humans = merged_firstlink.idx_company.values.astype(int)
 
     js = np.unique(np.concatenate([j_psc_humans, j_psc_companies]))
-    js_not_indexed = [j for j in js if j not in address_pscs.index]
+    js_not_indexed = js[~np.isin(js, address_pscs.index)]
 
     companies_not_indexed1 = psc_companies.loc[
         psc_companies.idx_company_2.isin(js_not_indexed),
@@ -381,9 +459,9 @@ def attr_address(
         "company_number"
     )
 
-    companies_not_indexed = companies_not_indexed.join(companies.set_index("company_number"))[
-        ["i", companies_country, companies_postal_code]
-    ].set_index("i")
+    companies_not_indexed = companies_not_indexed.join(
+        companies.set_index("company_number")[[companies_country, companies_postal_code]]
+    ).set_index("i")
 
     companies_not_indexed.index = companies_not_indexed.index.astype(int)
 
@@ -391,115 +469,114 @@ def attr_address(
         columns={companies_country: "country", companies_postal_code: "postal_code"}
     )
 
-    addresses = pd.concat([address_pscs, address_companies])
+    return pd.concat([address_pscs, address_companies])
 
-    set_nodes = set(sorted(list(graph.nodes())))
-    set_index = set(addresses.index.unique())
 
-    indices_non_appearing = list(set_index.symmetric_difference(set_nodes))
+def get_unique_values_per_node(values: pd.Series, nodes: pd.Index) -> tuple:
+    """Function to group the unique non-null values of a Series indexed by node.
+    Returns offsets and a categorical array of values, the values of nodes[k] being
+    values[offsets[k]:offsets[k + 1]] in order of appearance."""
+    df_values = pd.DataFrame({"node": values.index, "value": values.values})
+    df_values = df_values.dropna().drop_duplicates()
 
-    df_non = pd.DataFrame(index=indices_non_appearing)
-    df_non["country"] = np.nan
-    df_non["postal_code"] = np.nan
+    positions = nodes.get_indexer(df_values.node)
+    df_values = df_values.assign(position=positions)[positions != -1]
 
-    addresses = pd.concat([addresses, df_non])
+    counts = df_values.groupby("position", sort=True).size()
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    offsets[counts.index.values + 1] = counts.values
+    offsets = np.cumsum(offsets)
 
-    df_country = addresses[["country"]]
-    df_postal_code = addresses[["postal_code"]]
+    order = np.argsort(df_values.position.values, kind="stable")
+    node_values = pd.Categorical(df_values.value.values[order])
 
-    dict_country = {}
-    for node in df_country.index.unique():
-        country = df_country.loc[node, "country"]
-        if isinstance(country, pd.Series):
-            list_countries = country.unique()
-            if len(list_countries) == 1 and not isinstance(list_countries[0], str):
-                dict_country[node] = [np.nan]
-            elif len(list_countries) == 1 and isinstance(list_countries[0], str):
-                dict_country[node] = [list_countries[0]]
-            elif len(list_countries) > 1:
-                list_ = [country for country in list_countries if isinstance(country, str)]
-                dict_country[node] = list_
+    return offsets, node_values
 
-        else:
-            dict_country[node] = [country]
 
-    dict_postal_code = {}
-    for node in df_postal_code.index.unique():
-        postal_code = df_postal_code.loc[node, "postal_code"]
-        if isinstance(postal_code, pd.Series):
-            list_poscal_codes = postal_code.unique()
-            if len(list_poscal_codes) == 1 and not isinstance(list_poscal_codes[0], str):
-                dict_country[node] = [np.nan]
-            elif len(list_poscal_codes) == 1 and isinstance(list_poscal_codes[0], str):
-                dict_country[node] = [list_countries[0]]
-            elif len(list_countries) > 1:
-                list_ = [pc for pc in list_poscal_codes if isinstance(pc, str)]
-                dict_country[node] = list_
+def get_value_lists(offsets: np.ndarray, node_values: pd.Categorical) -> list:
+    """Function to expand grouped values to one list per node, [nan] for nodes without values"""
+    categories = np.append(node_values.categories.values.astype(object), np.nan)
+    codes = node_values.codes
 
-        else:
-            dict_postal_code[node] = [postal_code]
+    return [
+        list(categories[codes[start:end]]) if end > start else [np.nan]
+        for start, end in zip(offsets[:-1], offsets[1:])
+    ]
 
-    return dict_country, dict_postal_code
 
+class NodeValueLists(Sequence):
+    """Sequence of the lists of values of the nodes of a node table, in the order of its index,
+    as returned by get_unique_values_per_node. The values of position k are
+    node_values[offsets[k]:offsets[k + 1]], and are only expanded to a list when they are read,
+    [nan] for positions without values."""
 
-def get_nature_of_ownership_dict(
-    merged_firstlink: pd.DataFrame, psc_companies: pd.DataFrame
-) -> dict:
-    """Returns a dictionary with the natures of ownership list for each edge.
-    The dictionary is expected to be passed to nx.set_edge_attributes()"""
+    def __init__(self, offsets: np.ndarray, node_values: pd.Categorical) -> None:
+        self.offsets = offsets
+        self.node_values = node_values
 
-    edge = "edge"
-    weight = "ownership"
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
 
-    df1 = psc_companies[["natures_of_control", "idx_company", "idx_company_2"]].copy()
-    df2 = merged_firstlink[["natures_of_control", "idx_human", "idx_company"]].copy()
+    def __getitem__(self, k):
+        if not np.isscalar(k):
+            return self.take(k)
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(k)
 
-    df1[weight] = df1.natures_of_control.apply(lambda x: [n for n in x if n in types_of_ownership])
-    df2[weight] = df2.natures_of_control.apply(lambda x: [n for n in x if n in types_of_ownership])
+        start, end = self.offsets[k], self.offsets[k + 1]
+        if end == start:
+            return [np.nan]
+        return list(np.asarray(self.node_values[start:end], dtype=object))
 
-    df1[edge] = df1.apply(lambda row: (int(row["idx_company"]), int(row["idx_company_2"])), axis=1)
-    df2[edge] = df2.apply(lambda row: (int(row["idx_human"]), int(row["idx_company"])), axis=1)
+    def take(self, positions: np.ndarray) -> "NodeValueLists":
+        """Function to get the lists of some positions, positions -1 getting no values"""
+        positions = np.asarray(positions, dtype=np.int64)
+        found = positions != -1
+        starts = np.zeros(len(positions), dtype=np.int64)
+        lengths = np.zeros(len(positions), dtype=np.int64)
+        starts[found] = self.offsets[positions[found]]
+        lengths[found] = self.offsets[positions[found] + 1] - starts[found]
 
-    df_weight = (
-        pd.concat([df1[[edge, weight]], df2[[edge, weight]]]).drop_duplicates(edge).set_index(edge)
-    )
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        value_positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
 
-    weight_dict = df_weight.to_dict()[weight]
+        return NodeValueLists(offsets, self.node_values[value_positions])
 
-    return weight_dict
+    def to_lists(self) -> list:
+        """Function to expand the values to one list per position"""
+        return get_value_lists(self.offsets, self.node_values)
 
 
-def get_weight_dict(graph: nx.DiGraph) -> dict:
-    """Function to get the weight dictionary"""
-    dict_weigths_translate = {
-        "more-than-25": 0.25,
-        "25-to-50": 0.25,
-        "50-to-75": 0.5,
-        "75-to-100": 0.75,
+def get_address_lists(
+    nodes: pd.Index,
+    merged_firstlink: pd.DataFrame,
+    psc_companies: pd.DataFrame,
+    companies: pd.DataFrame,
+) -> dict:
+    """Function to get the unique countries and postal codes of the nodes as NodeValueLists"""
+    addresses = get_addresses(merged_firstlink, psc_companies, companies)
+
+    return {
+        column: NodeValueLists(*get_unique_values_per_node(addresses[column], nodes))
+        for column in ["country", "postal_code"]
     }
 
-    dict_weights = {}
-    edges = list(graph.edges(data=True))
-
-    for edge in edges:
-        edge_tuple = (edge[0], edge[1])
-        list_ownership = edge[2]["ownership"]
-        len_list = len(list_ownership)
-        if len_list == 0:
-            dict_weights[edge_tuple] = np.nan
-        elif len_list == 1:
-            value = [v for (k, v) in dict_weigths_translate.items() if k in list_ownership[0]][0]
-            dict_weights[edge_tuple] = value
-        else:
-            values = list()
-            for element in list_ownership:
-                value = [v for (k, v) in dict_weigths_translate.items() if k in element][0]
-                values.append(value)
-
-            unique = np.unique(values)
-            if len(unique) == 1:
-                dict_weights[edge_tuple] = unique[0]
-            else:
-                dict_weights[edge_tuple] = np.nan
-
-    return dict_weights
+
+def attr_address(
+    graph: nx.DiGraph,
+    merged_firstlink: pd.DataFrame,
+    psc_companies: pd.DataFrame,
+    companies: pd.DataFrame,
+) -> tuple:
+    """Returns two dictionaries with the addresses of nodes.
+    One for the registered country and another for the registered postal code.
+    The dictionary is expected to be passed to nx.set_node_attributes()"""
+    nodes = get_sorted_nodes(graph)
+    node_lists = get_address_lists(nodes, merged_firstlink, psc_companies, companies)
+
+    return (
+        dict(zip(nodes, node_lists["country"].to_lists())),
+        dict(zip(nodes, node_lists["postal_code"].to_lists())),
+    )
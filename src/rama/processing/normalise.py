@@ -0,0 +1,83 @@
+"""Vectorised normalisation of company numbers and names functions"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from rama.processing.lists import legal_suffixes
+
+
+def map_unique_values(values: pd.Series, func, as_category: bool = False) -> pd.Series:
+    """Function to apply a vectorised string function to the unique values of a Series only.
+    The result is mapped back through the category codes, so each distinct value
+    is normalised once. Missing values are kept as NaN."""
+    codes, uniques = pd.factorize(values)
+    normalised = func(pd.Series(uniques, dtype=object).astype(str))
+
+    # Different raw values can share the same normalised value
+    new_codes, categories = pd.factorize(normalised)
+    # Code -1 (missing values) maps to the padding slot at the end
+    codes = np.append(new_codes, -1)[codes]
+
+    categorical = pd.Categorical.from_codes(codes, categories=categories)
+    if as_category:
+        return pd.Series(categorical, index=values.index, name=values.name)
+
+    return pd.Series(
+        np.asarray(categorical, dtype=object), index=values.index, name=values.name
+    ).where(codes != -1, np.nan)
+
+
+def pad_company_numbers(numbers: pd.Series, max_length: int = 8) -> pd.Series:
+    """Function to pad an array of company number strings with 0s to max_length.
+    Numbers with a letter prefix (SC, NI, OC, ...) are padded after the prefix."""
+    numbers = numbers.str.strip().str.upper().str.replace(r"\.0$", "", regex=True)
+
+    parts = numbers.str.extract(r"^([A-Z]{0,2})(\d+)$")
+    prefixes = parts[0].fillna("")
+    digits = parts[1]
+
+    # Numbers that do not look like a company number are padded as a whole
+    padded = numbers.str.zfill(max_length)
+    for length in range(3):
+        mask = digits.notna() & (prefixes.str.len() == length)
+        padded[mask] = prefixes[mask] + digits[mask].str.zfill(max_length - length)
+
+    return padded
+
+
+def replace_legal_suffixes(names: pd.Series, suffixes: dict | None = None) -> pd.Series:
+    """Function to lower-case an array of names and replace the legal suffixes at their end.
+    Suffixes are whole words delimited by spaces, only followed by other suffixes, so
+    'co-op ltd' becomes 'co-op limited' and 'smith & co ltd' becomes 'smith & company limited'.
+    The suffixes table maps every variant to its normalised form, e.g. 'ltd' -> 'limited'."""
+    if suffixes is None:
+        suffixes = legal_suffixes
+
+    names = names.str.lower().str.replace(r"\s+", " ", regex=True).str.strip()
+
+    # Longest variants first, so 'public limited company' wins over shorter ones
+    variants = sorted(suffixes, key=len, reverse=True)
+    alternatives = "|".join(re.escape(variant) for variant in variants)
+    pattern = rf"(?<!\S)({alternatives})\.?(?=(?:\s+(?:{alternatives})\.?)*$)"
+
+    return names.str.replace(pattern, lambda match: suffixes[match.group(1)], regex=True)
+
+
+def normalise_company_numbers(
+    company_numbers: pd.Series, max_length: int = 8, as_category: bool = False
+) -> pd.Series:
+    """Function to normalise company numbers as array operations on their unique values"""
+    return map_unique_values(
+        company_numbers, lambda numbers: pad_company_numbers(numbers, max_length), as_category
+    )
+
+
+def normalise_company_names(
+    names: pd.Series, suffixes: dict | None = None, as_category: bool = False
+) -> pd.Series:
+    """Function to normalise company names as array operations on their unique values"""
+    return map_unique_values(
+        names, lambda unique_names: replace_legal_suffixes(unique_names, suffixes), as_category
+    )
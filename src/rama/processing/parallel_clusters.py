@@ -0,0 +1,136 @@
+"""Parallel analysis of clusters functions"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+import networkx as nx
+import numpy as np
+
+from rama.processing.array_graph import ArrayDiGraph
+from rama.processing.components import Components
+from rama.processing.node_attributes import get_node_table, set_node_table
+from rama.processing.study_graphs import (
+    classify_cluster,
+    get_dict_cluster,
+    get_small_clusters,
+)
+
+
+cluster_columns = ["human", "in_degree", "out_degree", "date_of_creation", "sic_codes"]
+
+
+def get_shard_bounds(sizes: np.ndarray, shard_size: int) -> np.ndarray:
+    """Function to group consecutive components, given their sizes, in shards of about
+    shard_size nodes. Components larger than shard_size get a shard of their own.
+    Returns the position of the first component of every shard, and len(sizes) at the end."""
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    shard_starts = offsets[:-1] // max(shard_size, 1)
+    is_first = np.ones(len(sizes), dtype=bool)
+    is_first[1:] = shard_starts[1:] != shard_starts[:-1]
+
+    return np.append(np.flatnonzero(is_first), len(sizes))
+
+
+def get_shards(
+    graph: nx.DiGraph | ArrayDiGraph,
+    components: Components,
+    numbers: np.ndarray,
+    shard_size: int,
+) -> Iterator[dict]:
+    """Generator of the data needed to analyse the clusters with the given numbers, by shard:
+    the nodes and edges of the shard, in the order of the graph, the node table rows used by
+    get_dict_cluster and the numbers and nodes of its components.
+    Nodes and edges are split by shard in a single pass."""
+    bounds = get_shard_bounds(components.sizes[numbers], shard_size)
+    shard_of_component = np.full(len(components), -1)
+    shard_of_component[numbers] = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+
+    if isinstance(graph, ArrayDiGraph):
+        nodes = graph.node_ids
+        origins = graph.node_ids[graph.edge_sources]
+        destinations = graph.node_ids[graph.out_targets]
+    else:
+        nodes = np.fromiter(graph.nodes, dtype=np.int64, count=graph.number_of_nodes())
+        edges = np.array(list(graph.edges), dtype=np.int64).reshape(-1, 2)
+        origins, destinations = edges[:, 0], edges[:, 1]
+
+    node_table = get_node_table(graph)[cluster_columns]
+
+    # Every edge belongs to the shard of its origin, as components are weakly connected.
+    # Nodes and edges of the components not analysed have shard -1 and are sorted first
+    node_shards = shard_of_component[components.labels[np.searchsorted(components.node_ids, nodes)]]
+    edge_shards = shard_of_component[
+        components.labels[np.searchsorted(components.node_ids, origins)]
+    ]
+    node_order = np.argsort(node_shards, kind="stable")
+    edge_order = np.argsort(edge_shards, kind="stable")
+    node_offsets = np.searchsorted(node_shards[node_order], np.arange(len(bounds)))
+    edge_offsets = np.searchsorted(edge_shards[edge_order], np.arange(len(bounds)))
+
+    for shard in range(len(bounds) - 1):
+        shard_nodes = nodes[node_order[node_offsets[shard] : node_offsets[shard + 1]]]
+        shard_edges = edge_order[edge_offsets[shard] : edge_offsets[shard + 1]]
+        shard_numbers = numbers[bounds[shard] : bounds[shard + 1]].tolist()
+        yield {
+            "backend": "array" if isinstance(graph, ArrayDiGraph) else "networkx",
+            "nodes": shard_nodes,
+            "origins": origins[shard_edges],
+            "destinations": destinations[shard_edges],
+            "node_table": node_table.loc[np.sort(shard_nodes)],
+            "components": [(k, components[k]) for k in shard_numbers],
+        }
+
+
+def get_shard_graph(shard: dict) -> nx.DiGraph | ArrayDiGraph:
+    """Function to rebuild the subgraph of a shard, with the same node and edge order"""
+    if shard["backend"] == "array":
+        graph = ArrayDiGraph.from_arrays(shard["origins"], shard["destinations"], shard["nodes"])
+    else:
+        graph = nx.DiGraph()
+        graph.add_nodes_from(shard["nodes"].tolist())
+        graph.add_edges_from(zip(shard["origins"].tolist(), shard["destinations"].tolist()))
+    set_node_table(graph, shard["node_table"])
+
+    return graph
+
+
+def analyse_shard(shard: dict) -> list:
+    """Function to get the number and the classified dictionary of every cluster of a shard"""
+    graph = get_shard_graph(shard)
+
+    return [
+        (k, classify_cluster(get_dict_cluster(graph, nodes.tolist())))
+        for k, nodes in shard["components"]
+    ]
+
+
+def get_dict_clusters(
+    graph: nx.DiGraph | ArrayDiGraph,
+    components: Components,
+    n_workers: int = 1,
+    shard_size: int = 50_000,
+    max_small_size: int = 3,
+) -> dict:
+    """Function to get the classified dictionary of every cluster, numbered like the components.
+    Clusters of at most max_small_size nodes without cycles are summarised all at once by
+    get_small_clusters, and the others one by one with get_dict_cluster.
+    With n_workers > 1, these are grouped in shards of about shard_size nodes, so the many
+    small clusters are sent together, and the shards are analysed on a process pool.
+    Every worker gets only the subgraph of its shard."""
+    dict_clusters = get_small_clusters(graph, components, max_small_size)
+    numbers = np.setdiff1d(np.arange(len(components)), np.fromiter(dict_clusters, dtype=np.int64))
+
+    if n_workers <= 1:
+        for k in numbers.tolist():
+            dict_clusters[k] = classify_cluster(get_dict_cluster(graph, components[k].tolist()))
+    else:
+        # At least a few shards per worker, so the largest clusters do not leave workers idle
+        n_nodes = int(components.sizes[numbers].sum())
+        shard_size = max(1, min(shard_size, -(-n_nodes // (4 * n_workers))))
+
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            shards = get_shards(graph, components, numbers, shard_size)
+            for shard_clusters in executor.map(analyse_shard, shards):
+                dict_clusters.update(shard_clusters)
+
+    return {k: dict_clusters[k] for k in range(len(components))}
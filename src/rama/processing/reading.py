@@ -0,0 +1,199 @@
+"""Reading database files functions"""
+
+import io
+import json
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from rama.processing.cleaning import clean_companies_chunk, clean_psc_chunk
+from rama.processing.lists import (
+    companies_api_columns,
+    companies_columns,
+    companies_dtypes,
+    psc_columns,
+    psc_dtypes,
+    psc_identification_columns,
+)
+
+
+def read_psc(
+    path: str,
+    filename: str,
+    string_ownership: str = "ownership-of-shares",
+    chunksize: int = 1_000_000,
+) -> pd.DataFrame:
+    """Function to stream a PSC CSV file in chunks.
+    Only the columns in psc_columns and psc_identification_columns are parsed and every chunk
+    is filtered by string_ownership and normalised before being kept, so memory tracks the
+    filtered output."""
+    reader = pd.read_csv(
+        path + filename,
+        usecols=lambda column: column in psc_columns or column in psc_identification_columns,
+        dtype=psc_dtypes,
+        chunksize=chunksize,
+    )
+    chunks = [clean_psc_chunk(chunk, string_ownership) for chunk in reader]
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_companies(path: str, filename: str, chunksize: int = 1_000_000) -> pd.DataFrame:
+    """Function to stream a companies CSV file in chunks.
+    Only the known company columns are parsed and every chunk is normalised before being kept."""
+    reader = pd.read_csv(
+        path + filename,
+        usecols=lambda column: column in companies_columns or column in companies_api_columns,
+        dtype=companies_dtypes,
+        chunksize=chunksize,
+    )
+    chunks = [clean_companies_chunk(chunk) for chunk in reader]
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def is_jsonl(filename: str) -> bool:
+    """Function to check if a file is a JSON lines snapshot, plain or zipped.
+    The first line of the file, or of the first file inside the zip file, is sniffed: JSON lines
+    records start with "{", while CSV files start with their header row."""
+    for line in iter_jsonl_lines(filename):
+        if line.strip():
+            return line.lstrip("\ufeff").lstrip().startswith("{")
+
+    return False
+
+
+def iter_jsonl_lines(filename: str) -> Iterator[str]:
+    """Generator over the lines of a text file, or of every file inside a zip file"""
+    if zipfile.is_zipfile(filename):
+        with zipfile.ZipFile(filename) as zip_file:
+            for member in sorted(zip_file.namelist()):
+                if member.endswith("/"):
+                    continue
+                with io.TextIOWrapper(zip_file.open(member), encoding="utf-8") as file:
+                    yield from file
+    else:
+        with open(filename, encoding="utf-8") as file:
+            yield from file
+
+
+def flatten_psc_record(record: dict, fields: Sequence[tuple]) -> list:
+    """Function to flatten the fields of a PSC snapshot record into a row.
+    Lists (natures of control) are kept as their string repr, like in the CSV files."""
+    data = record["data"]
+    row = []
+    for field in fields:
+        if field == ("company_number",):
+            value = record.get("company_number")
+        elif len(field) == 1:
+            value = data.get(field[0])
+        else:
+            value = data.get(field[0], {}).get(field[1])
+
+        if isinstance(value, (list, bool)):
+            value = str(value)
+        row.append(value)
+
+    return row
+
+
+def iter_psc_jsonl(path: str, filename: str, batch_size: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Generator yielding batches of PSC records from the Companies House JSON lines snapshot.
+    Only the fields in psc_columns and psc_identification_columns are flattened and the batches
+    follow psc_dtypes."""
+    columns = psc_columns + psc_identification_columns
+    fields = [tuple(column.split(".")) for column in columns]
+    float_columns = [column for column, dtype in psc_dtypes.items() if dtype != str]
+
+    rows = []
+    for line in iter_jsonl_lines(path + filename):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        # The snapshot ends with a totals record, which is not a PSC
+        if "company_number" not in record:
+            continue
+        rows.append(flatten_psc_record(record, fields))
+
+        if len(rows) == batch_size:
+            yield get_psc_batch(rows, columns, float_columns)
+            rows = []
+
+    if len(rows) > 0:
+        yield get_psc_batch(rows, columns, float_columns)
+
+
+def get_psc_batch(rows: list, columns: list, float_columns: list) -> pd.DataFrame:
+    """Function to make a typed PSC DataFrame from flattened rows"""
+    batch = pd.DataFrame(rows, columns=columns, dtype=object)
+    batch = batch.where(batch.notna(), np.nan)
+    batch = batch.astype({column: "float64" for column in float_columns})
+
+    return batch
+
+
+def read_psc_jsonl(
+    path: str,
+    filename: str,
+    string_ownership: str = "ownership-of-shares",
+    batch_size: int = 1_000_000,
+) -> pd.DataFrame:
+    """Function to stream a PSC JSON lines snapshot, cleaning every batch as it is read"""
+    batches = [
+        clean_psc_chunk(batch, string_ownership)
+        for batch in iter_psc_jsonl(path, filename, batch_size)
+    ]
+
+    return pd.concat(batches, ignore_index=True)
+
+
+def read_psc_part(
+    path: str,
+    filename: str,
+    string_ownership: str = "ownership-of-shares",
+    chunksize: int | None = None,
+) -> pd.DataFrame:
+    """Function to read and clean one PSC part file, CSV or JSON lines.
+    Company numbers are read as strings, as a part file might only contain numeric ones."""
+    if is_jsonl(path + filename):
+        return read_psc_jsonl(path, filename, string_ownership, chunksize or 1_000_000)
+    if chunksize is None:
+        psc = pd.read_csv(path + filename, dtype={"company_number": str})
+        return clean_psc_chunk(psc, string_ownership)
+    return read_psc(path, filename, string_ownership, chunksize)
+
+
+def read_companies_part(path: str, filename: str, chunksize: int | None = None) -> pd.DataFrame:
+    """Function to read and clean one companies part file"""
+    if chunksize is None:
+        companies = pd.read_csv(path + filename, dtype={"company_number": str})
+        return clean_companies_chunk(companies)
+    return read_companies(path, filename, chunksize)
+
+
+def read_parts_parallel(
+    path: str,
+    psc_filenames: Sequence[str],
+    companies_filenames: Sequence[str],
+    string_ownership: str = "ownership-of-shares",
+    chunksize: int | None = None,
+    n_workers: int = 2,
+) -> tuple:
+    """Function to read and clean the PSC and companies part files on a process pool.
+    Every worker parses and cleans one part file, and the parts are returned in input order."""
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures_psc = [
+            executor.submit(read_psc_part, path, name, string_ownership, chunksize)
+            for name in psc_filenames
+        ]
+        futures_companies = [
+            executor.submit(read_companies_part, path, name, chunksize)
+            for name in companies_filenames
+        ]
+        list_pscs = [future.result() for future in futures_psc]
+        list_companies = [future.result() for future in futures_companies]
+
+    return list_pscs, list_companies
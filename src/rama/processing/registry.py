@@ -0,0 +1,182 @@
+"""Persistent entity id registry functions"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from rama.processing.company_index import get_company_index, get_company_names
+
+
+class EntityRegistry:
+    """Persistent mapping from entity keys to stable integer node ids.
+    Keys are strings such as 'company:01234567' or 'human:john smith|1970.0|5.0'.
+    Ids start at 1 and are never reused, so they stay valid across runs and snapshots."""
+
+    def __init__(self, filename: str | None = None) -> None:
+        self.filename = filename
+        self.keys = pd.Index([], dtype=object)
+        self.ids = np.array([], dtype=np.int64)
+
+        if filename is not None and os.path.exists(filename):
+            df_registry = pd.read_parquet(filename)
+            self.keys = pd.Index(df_registry.key.values, dtype=object)
+            self.ids = df_registry.id.values.astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup_or_assign(self, keys: pd.Series | np.ndarray) -> np.ndarray:
+        """Function to get the ids of an array of keys, assigning new ids to unseen keys"""
+        keys = pd.Index(keys, dtype=object)
+        unique_keys = keys.unique()
+        new_keys = unique_keys[self.keys.get_indexer(unique_keys) == -1]
+
+        if len(new_keys) > 0:
+            start = self.ids.max() + 1 if len(self.ids) > 0 else 1
+            self.keys = self.keys.append(new_keys)
+            self.ids = np.concatenate([self.ids, np.arange(start, start + len(new_keys))])
+
+        return self.ids[self.keys.get_indexer(keys)]
+
+    def add_keys(self, keys: pd.Series | np.ndarray, ids: np.ndarray) -> None:
+        """Function to register unseen keys as aliases of existing ids"""
+        keys = pd.Index(keys, dtype=object)
+        is_new = (self.keys.get_indexer(keys) == -1) & ~keys.duplicated()
+        self.keys = self.keys.append(keys[is_new])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)[is_new]])
+
+    def get_node_ids(self, node_keys: pd.DataFrame) -> pd.Series:
+        """Function to get the id of every node from its candidate keys, given in order of
+        preference. Nodes sharing a key are the same entity and get the same id: the id of
+        their first known key, or a new id for their first key. Their other keys are registered
+        as aliases, so the entity keeps its id when it is later only found by one of them."""
+        groups = pd.Series(get_key_groups(node_keys), index=node_keys.index)
+        node_keys = node_keys.loc[groups.sort_values(kind="stable").index]
+        groups = groups[node_keys.index]
+
+        is_known = self.keys.get_indexer(pd.Index(node_keys.key, dtype=object)) != -1
+        known_keys = node_keys[is_known].groupby(groups[is_known], sort=False).key.first()
+        group_ids = pd.Series(self.lookup_or_assign(known_keys.values), index=known_keys.index)
+
+        new_keys = node_keys[~groups.isin(group_ids.index)].groupby(groups, sort=False).key.first()
+        new_ids = pd.Series(self.lookup_or_assign(new_keys.values), index=new_keys.index)
+        group_ids = pd.concat([group_ids, new_ids])
+
+        ids = groups.map(group_ids)
+        self.add_keys(node_keys.key.values, ids.values)
+
+        return pd.Series(ids.values, index=node_keys.node.values).groupby(level=0).first()
+
+    def save(self, filename: str | None = None) -> None:
+        """Function to save the registry as a Parquet file"""
+        filename = filename or self.filename
+        df_registry = pd.DataFrame({"key": self.keys.values, "id": self.ids})
+        df_registry.to_parquet(filename + ".tmp")
+        os.replace(filename + ".tmp", filename)
+
+
+def get_key_groups(node_keys: pd.DataFrame) -> np.ndarray:
+    """Function to get the entity of every row of node_keys, nodes sharing a key directly or
+    through other nodes being the same entity.
+    Labels are propagated between nodes and keys until every connected group has one label."""
+    nodes = pd.factorize(node_keys.node)[0]
+    keys = pd.factorize(node_keys.key)[0]
+    node_labels = np.arange(nodes.max() + 1 if len(nodes) > 0 else 0)
+
+    while True:
+        key_labels = np.full(keys.max() + 1 if len(keys) > 0 else 0, len(node_labels))
+        np.minimum.at(key_labels, keys, node_labels[nodes])
+        new_labels = node_labels.copy()
+        np.minimum.at(new_labels, nodes, key_labels[keys])
+        if np.array_equal(new_labels, node_labels):
+            return node_labels[nodes]
+        node_labels = new_labels
+
+
+def get_node_keys(
+    merged_firstlink: pd.DataFrame,
+    psc_companies: pd.DataFrame,
+    sspsc: pd.DataFrame,
+    companies: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """Function to get the candidate registry keys of every node id assigned by process_database,
+    in order of preference. Companies are identified by company number, and owners that are only
+    known by name are resolved to a company number through the names in companies, or keyed by
+    name otherwise. Humans are identified by name and date of birth, every spelling variant of
+    a merged human being a candidate. SSPSCs are identified by company number and order of
+    appearance. Several nodes can share a key, when the same entity got several node ids.
+    The rows are sorted by preference, so the order of the input rows does not matter."""
+    human_keys = (
+        "human:"
+        + merged_firstlink.name.astype(str)
+        + "|"
+        + merged_firstlink["date_of_birth.year"].astype(str)
+        + "|"
+        + merged_firstlink["date_of_birth.month"].astype(str)
+    )
+    sspsc_keys = (
+        "sspsc:"
+        + sspsc.company_number.astype(str)
+        + "|"
+        + sspsc.groupby("company_number").cumcount().astype(str)
+    )
+
+    owner_numbers = pd.Series(np.nan, index=psc_companies.index, dtype=object)
+    if companies is not None:
+        names_index, _ = get_company_index(get_company_names(companies))
+        owner_numbers = psc_companies.company_name.map(names_index)
+
+    # Earlier sources take priority when a node appears in several of them
+    sources = [
+        (merged_firstlink.idx_human, human_keys),
+        (merged_firstlink.idx_company, "company:" + merged_firstlink.company_number.astype(str)),
+        (psc_companies.idx_company_2, "company:" + psc_companies.company_number.astype(str)),
+        (sspsc.idx_company, "company:" + sspsc.company_number.astype(str)),
+        (psc_companies.idx_company, "company:" + owner_numbers),
+        (psc_companies.idx_company, "name:" + psc_companies.company_name.astype(str)),
+        (sspsc.i, sspsc_keys),
+    ]
+    node_keys = pd.concat(
+        [
+            pd.DataFrame({"source": source, "node": nodes.values, "key": keys.values})
+            for source, (nodes, keys) in enumerate(sources)
+            if len(nodes) > 0
+        ]
+    )
+    node_keys = node_keys.dropna().sort_values(["source", "key", "node"], kind="stable")
+    node_keys = node_keys.drop_duplicates(["node", "key"])
+
+    return node_keys[["node", "key"]].reset_index(drop=True)
+
+
+def stabilise_node_ids(
+    list_dfs: list,
+    registry: EntityRegistry,
+    columns: dict | None = None,
+    companies: pd.DataFrame | None = None,
+) -> list:
+    """Function to replace the node ids of the processed dataframes by stable registry ids.
+    list_dfs contains small_firstlink, merged_firstlink, psc_companies and sspsc.
+    companies is used to key owners by company number, see get_node_keys()."""
+    if columns is None:
+        columns = {
+            "small_firstlink": ["idx_human", "idx_company"],
+            "merged_firstlink": ["idx_human", "idx_company"],
+            "psc_companies": ["idx_company", "idx_company_2"],
+            "sspsc": ["i", "idx_company"],
+        }
+    _, merged_firstlink, psc_companies, sspsc = list_dfs
+
+    node_keys = get_node_keys(merged_firstlink, psc_companies, sspsc, companies)
+    stable_ids = registry.get_node_ids(node_keys)
+
+    stable_dfs = []
+    for df, df_columns in zip(list_dfs, columns.values()):
+        df = df.copy()
+        for column in df_columns:
+            if column in df.columns:
+                df[column] = df[column].map(stable_ids)
+        stable_dfs.append(df)
+
+    return stable_dfs
@@ -0,0 +1,253 @@
+"""Saving and loading initialised graphs functions"""
+
+import json
+import os
+import shutil
+from collections.abc import Mapping
+from typing import Sequence
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from rama.processing.array_graph import ArrayDiGraph, csr_array_names
+from rama.processing.cluster_view import LazyClusters
+from rama.processing.components import Components
+from rama.processing.node_attributes import NodeValueLists, get_node_table
+
+
+summary_fields = [
+    "number_of_nodes",
+    "number_of_roots",
+    "number_of_branches",
+    "max_length",
+    "number_of_humans",
+    "growing_time",
+    "min_date_of_creation",
+    "max_date_of_creation",
+    "class_int",
+    "class_str",
+]
+
+date_fields = ["min_date_of_creation", "max_date_of_creation"]
+
+
+# Columns
+
+
+def get_codes_dtype(n_categories: int) -> type:
+    """Function to get the smallest integer dtype for the codes of n_categories categories,
+    the one pandas uses, so categoricals can be built on memory-mapped codes without a copy"""
+    for dtype in [np.int8, np.int16, np.int32]:
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def encode_values(values: Sequence) -> tuple:
+    """Function to encode an array of Python objects as integer codes into its unique values.
+    Lists are compared by content, and missing values get the code -1."""
+    keys = pd.Series(
+        [tuple(value) if isinstance(value, list) else value for value in values], dtype=object
+    )
+    codes, uniques = pd.factorize(keys)
+
+    values_array = np.empty(len(uniques), dtype=object)
+    for code, unique in enumerate(uniques):
+        values_array[code] = list(unique) if isinstance(unique, tuple) else unique
+
+    return codes.astype(get_codes_dtype(len(uniques))), values_array
+
+
+def save_column(folder: str, name: str, values: pd.Series | np.ndarray) -> None:
+    """Function to save a column as .npy files that can be memory-mapped.
+    Numeric, boolean and datetime columns are saved as they are, categorical columns as codes
+    and categories, and other columns as codes into an array of their unique values."""
+    filename = os.path.join(folder, name)
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories.to_numpy(dtype=object)
+        np.save(filename + ".npy", values.cat.codes.to_numpy())
+        np.save(filename + ".categories.npy", categories)
+        return
+
+    values = np.asarray(values)
+    if values.dtype.kind in "biufM":
+        np.save(filename + ".npy", values)
+        return
+
+    codes, values_array = encode_values(values)
+    np.save(filename + ".npy", codes)
+    np.save(filename + ".values.npy", values_array)
+
+
+def load_column(folder: str, name: str, mmap_mode: str | None = "r") -> np.ndarray | pd.Categorical:
+    """Function to load a column saved with save_column.
+    Numeric, boolean and datetime columns are memory-mapped when mmap_mode is given.
+    Categorical and object columns are categoricals over their memory-mapped codes, so values
+    are only decoded when they are read. Lists are categories as tuples."""
+    filename = os.path.join(folder, name)
+    codes = np.load(filename + ".npy", mmap_mode=mmap_mode)
+    for extension in [".categories.npy", ".values.npy"]:
+        if os.path.exists(filename + extension):
+            values_array = np.load(filename + extension, allow_pickle=True)
+            categories = pd.Index(
+                [tuple(value) if isinstance(value, list) else value for value in values_array],
+                dtype=object,
+                tupleize_cols=False,
+            )
+            codes = codes.astype(get_codes_dtype(len(categories)), copy=False)
+            return pd.Categorical.from_codes(codes, categories=categories, validate=False)
+
+    return codes
+
+
+# Graph
+
+
+def get_csr_graph(graph: nx.DiGraph | ArrayDiGraph) -> ArrayDiGraph:
+    """Function to get the arrays of a graph as an ArrayDiGraph, with its edge attributes.
+    An ArrayDiGraph is returned as it is."""
+    if isinstance(graph, ArrayDiGraph):
+        return graph
+
+    edges = list(graph.edges(data=True))
+    origins = np.array([edge[0] for edge in edges], dtype=np.int64)
+    destinations = np.array([edge[1] for edge in edges], dtype=np.int64)
+    node_ids = np.array(sorted(graph.nodes), dtype=np.int64)
+
+    csr_graph = ArrayDiGraph.from_arrays(origins, destinations, node_ids)
+    positions = csr_graph.get_edge_positions(origins, destinations)
+
+    names = dict.fromkeys(name for _, _, data in edges for name in data)
+    for name in names:
+        edge_values = np.full(len(edges), np.nan, dtype=object)
+        edge_values[positions] = pd.Series(
+            [data.get(name, np.nan) for _, _, data in edges], dtype=object
+        ).to_numpy()
+        csr_graph.edge_data[name] = pd.Series(edge_values).infer_objects().to_numpy()
+
+    return csr_graph
+
+
+# Main functions
+
+
+def save_initialised(
+    path: str,
+    graph: nx.DiGraph | ArrayDiGraph,
+    connected_components: Components | Sequence[set],
+    dict_cluster: Mapping,
+) -> None:
+    """Function to save the outputs of initialise to a folder of .npy files.
+    The folder holds the graph as CSR/CSC arrays, one file per node and edge attribute,
+    the offsets and values of the node lists, the nodes of every component and one file per
+    cluster summary.
+    Files are written to a temporary folder first so an interrupted save is never read."""
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    for folder in ["graph", "nodes", "node_lists", "edges", "components", "clusters"]:
+        os.makedirs(os.path.join(tmp_path, folder))
+
+    csr_graph = get_csr_graph(graph)
+    for name in csr_array_names:
+        np.save(os.path.join(tmp_path, "graph", name + ".npy"), getattr(csr_graph, name))
+
+    node_table = get_node_table(graph)
+    positions = node_table.index.get_indexer(csr_graph.node_ids)
+    node_lists = graph.graph.get("node_lists", {}) if "node_table" in graph.graph else {}
+    node_table = node_table.reindex(csr_graph.node_ids)
+    for column in node_table.columns:
+        save_column(os.path.join(tmp_path, "nodes"), column, node_table[column])
+    for column, lists in node_lists.items():
+        lists = lists[positions]
+        save_column(os.path.join(tmp_path, "node_lists"), column, pd.Series(lists.node_values))
+        np.save(os.path.join(tmp_path, "node_lists", column + ".offsets.npy"), lists.offsets)
+    for name, values in csr_graph.edge_data.items():
+        save_column(os.path.join(tmp_path, "edges"), name, values)
+
+    if isinstance(connected_components, Components):
+        component_nodes, component_offsets = (
+            connected_components.nodes,
+            connected_components.offsets,
+        )
+    else:
+        lengths = np.array([len(component) for component in connected_components], dtype=np.int64)
+        component_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        component_nodes = np.fromiter(
+            (node for component in connected_components for node in component),
+            dtype=np.int64,
+            count=component_offsets[-1],
+        )
+    np.save(os.path.join(tmp_path, "components", "nodes.npy"), component_nodes)
+    np.save(os.path.join(tmp_path, "components", "offsets.npy"), component_offsets)
+
+    for field in summary_fields:
+        values = pd.Series([dict_cluster[k][field] for k in range(len(dict_cluster))], dtype=object)
+        if field in date_fields:
+            values = pd.to_datetime(values)
+        save_column(os.path.join(tmp_path, "clusters"), field, values.infer_objects())
+
+    with open(os.path.join(tmp_path, "columns.json"), "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "nodes": list(node_table.columns),
+                "node_lists": list(node_lists),
+                "edges": list(csr_graph.edge_data),
+            },
+            file,
+        )
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def load_initialised(path: str, mmap_mode: str | None = "r") -> tuple:
+    """Function to load the outputs of initialise saved with save_initialised.
+    The graph is an ArrayDiGraph, connected_components a Components sequence and dict_cluster
+    a LazyClusters mapping over the saved summaries. With mmap_mode="r", the arrays are
+    memory-mapped, so only the pages that are used are read from disk. String and list
+    attributes are categoricals over their codes, and lists are read from the node table as
+    tuples. The node lists are NodeValueLists over their memory-mapped offsets and codes."""
+    with open(os.path.join(path, "columns.json"), encoding="utf-8") as file:
+        columns = json.load(file)
+
+    arrays = {
+        name: np.load(os.path.join(path, "graph", name + ".npy"), mmap_mode=mmap_mode)
+        for name in csr_array_names
+    }
+    graph = ArrayDiGraph.from_csr_arrays(arrays)
+
+    node_columns = {
+        column: load_column(os.path.join(path, "nodes"), column, mmap_mode)
+        for column in columns["nodes"]
+    }
+    node_table = pd.DataFrame(node_columns, index=pd.Index(graph.node_ids), copy=False)
+    node_lists = {
+        column: NodeValueLists(
+            np.load(os.path.join(path, "node_lists", column + ".offsets.npy"), mmap_mode=mmap_mode),
+            load_column(os.path.join(path, "node_lists"), column, mmap_mode),
+        )
+        for column in columns.get("node_lists", [])
+    }
+    graph.graph["node_table"] = node_table
+    graph.graph["node_lists"] = node_lists
+    graph.node_data.update(node_columns)
+    graph.node_data.update(node_lists)
+    for name in columns["edges"]:
+        graph.edge_data[name] = load_column(os.path.join(path, "edges"), name, mmap_mode)
+
+    component_nodes = np.load(os.path.join(path, "components", "nodes.npy"), mmap_mode=mmap_mode)
+    component_offsets = np.load(os.path.join(path, "components", "offsets.npy"))
+    connected_components = Components.from_offsets(
+        graph.node_ids, component_nodes, component_offsets
+    )
+
+    summaries = {
+        field: load_column(os.path.join(path, "clusters"), field, mmap_mode)
+        for field in summary_fields
+    }
+    dict_cluster = LazyClusters(graph, connected_components, summaries=summaries)
+
+    return graph, connected_components, dict_cluster
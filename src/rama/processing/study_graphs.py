@@ -5,6 +5,11 @@ from typing import Any, Sequence
 
 import networkx as nx
 import numpy as np
+import pandas as pd
+
+from rama.processing.array_graph import ArrayDiGraph
+from rama.processing.components import Components
+from rama.processing.node_attributes import get_nodes_attributes
 
 
 # Dictionaries
@@ -12,7 +17,7 @@ import numpy as np
 
 def dict_nodes(graph: nx.DiGraph) -> dict:
     """Function to construct a dictionary with the information of the nodes of a graph"""
-    return dict(graph.nodes(data=True))
+    return get_nodes_attributes(graph, list(graph.nodes)).to_dict("index")
 
 
 def dict_edges(graph: nx.DiGraph) -> dict:
@@ -50,45 +55,140 @@ def keep_longest_path(list_paths: list) -> list:
     return list_
 
 
+def get_strongly_connected_components(successors: list) -> list:
+    """Function to get the strongly connected component of every node from its list of successors,
+    with an iterative Tarjan algorithm. Components are numbered in reverse topological order,
+    i.e. a component only has edges to components with a lower number."""
+    n_nodes = len(successors)
+    index = [-1] * n_nodes
+    lowlink = [0] * n_nodes
+    on_stack = [False] * n_nodes
+    components = [-1] * n_nodes
+    stack: list[int] = []
+    counter = 0
+    n_components = 0
+
+    for root in range(n_nodes):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, k = work.pop()
+            if k == 0:
+                index[node] = lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+            elif k > 0:
+                # Back from the successor k - 1
+                lowlink[node] = min(lowlink[node], lowlink[successors[node][k - 1]])
+
+            for k_next in range(k, len(successors[node])):
+                successor = successors[node][k_next]
+                if index[successor] == -1:
+                    work.append((node, k_next + 1))
+                    work.append((successor, 0))
+                    break
+                if on_stack[successor]:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                if lowlink[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        components[member] = n_components
+                        if member == node:
+                            break
+                    n_components += 1
+
+    return components
+
+
 def get_max_length(graph: nx.DiGraph, list_nodes: Sequence[str | int]) -> int:
-    """Function to get the max length of a path in a graph"""
-    lens = []
-    for node in list_nodes:
-        lens += find_all_paths(graph, node)
-    max_len = len(keep_longest_path(lens)[0]) - 1
+    """Function to get the max length of a path in a graph.
+    The strongly connected components are condensed and the longest path is found with dynamic
+    programming in topological order. Crossing a cycle of s companies counts s - 1, and a node
+    owning itself gives a path of length 1, as find_all_paths does."""
+    positions = {node: k for k, node in enumerate(list_nodes)}
+    successors = [
+        [positions[successor] for successor in graph[node] if successor in positions]
+        for node in list_nodes
+    ]
+    has_self_loop = any(k in successors[k] for k in range(len(successors)))
+    components = get_strongly_connected_components(successors)
+
+    n_components = max(components) + 1 if components else 0
+    members: list[list[int]] = [[] for _ in range(n_components)]
+    for node, component in enumerate(components):
+        members[component].append(node)
+    weights = [len(nodes) - 1 for nodes in members]
+
+    # Components with higher numbers come first in topological order
+    lengths = list(weights)
+    for component in range(n_components - 1, -1, -1):
+        for node in members[component]:
+            for successor in successors[node]:
+                next_component = components[successor]
+                if next_component != component:
+                    lengths[next_component] = max(
+                        lengths[next_component],
+                        lengths[component] + 1 + weights[next_component],
+                    )
+
+    max_len = max(lengths, default=0)
+    if has_self_loop:
+        max_len = max(max_len, 1)
     return max_len
 
 
 # Dates
 
 
+def get_days(dates: Sequence[Any], format_date: str = "%Y-%m-%d") -> np.ndarray:
+    """Function to get dates as a datetime64[D] array, with NaT for missing dates.
+    Dates of creation are parsed when the node attributes are set, so only strings, e.g. from
+    node tables built by hand, and Python datetimes are parsed here."""
+    dates = np.asarray(dates)
+    if dates.dtype.kind != "M":
+        dates = pd.to_datetime(
+            pd.Series(dates, dtype=object).map(
+                lambda date: date if isinstance(date, (str, dt.datetime)) else None
+            ),
+            format=format_date,
+        ).to_numpy()
+
+    return dates.astype("datetime64[D]")
+
+
+def get_python_dates(days: np.ndarray) -> list:
+    """Function to get a datetime64 array as a list of Python datetimes, with NaN for NaT"""
+    python_dates = np.full(len(days), np.nan, dtype=object)
+    is_date = ~np.isnat(days)
+    python_dates[is_date] = days[is_date].astype("datetime64[us]").astype(object)
+
+    return python_dates.tolist()
+
+
+def get_years(deltas: np.ndarray, period: float = 365.2425) -> np.ndarray:
+    """Function to get timedelta64[D] values in years, with NaN for NaT"""
+    return np.where(np.isnat(deltas), np.nan, deltas.astype(np.int64) / period)
+
+
 def get_dates_with_nans(
     graph: nx.DiGraph, list_nodes: Sequence[int | str], format_date: str = "%Y-%m-%d"
 ) -> list:
     """Function to get the dates from an array containing nans"""
-    dates_str = np.array(
-        [
-            (
-                graph.nodes[node]["date_of_creation"]
-                if isinstance(graph.nodes[node]["date_of_creation"], str)
-                else "nan"
-            )
-            for node in list_nodes
-        ]
-    )
-    dates_dt = [
-        dt.datetime.strptime(date, format_date) if date != "nan" else np.nan for date in dates_str
-    ]
+    dates_of_creation = get_nodes_attributes(graph, list_nodes, ["date_of_creation"])
 
-    return dates_dt
+    return get_python_dates(get_days(dates_of_creation.date_of_creation, format_date))
 
 
 def get_growingtime(dates: Sequence[Any], period: float = 365.2425) -> float:
     """Function to get the growing time of a given array of dates."""
-    dates_without_nans = [date for date in dates if isinstance(date, dt.datetime)]
-    if len(dates_without_nans) != 0:
-        life_dt = max(dates_without_nans) - min(dates_without_nans)
-        life_years = life_dt.days / period
+    days = get_days(dates)
+    days = days[~np.isnat(days)]
+    if len(days) != 0:
+        life_years = float(get_years(days.max() - days.min(), period))
     else:
         life_years = np.nan
 
@@ -97,10 +197,10 @@ def get_growingtime(dates: Sequence[Any], period: float = 365.2425) -> float:
 
 def get_min_max_dates(dates: Sequence[Any]) -> tuple:
     """Function to get the min and max dates from an array"""
-    dates = [date for date in dates if isinstance(date, dt.datetime)]
-    if len(dates) != 0:
-        max_ = max(dates)
-        min_ = min(dates)
+    days = get_days(dates)
+    days = days[~np.isnat(days)]
+    if len(days) != 0:
+        min_, max_ = get_python_dates(np.array([days.min(), days.max()]))
     else:
         max_ = np.nan
         min_ = np.nan
@@ -110,46 +210,49 @@ def get_min_max_dates(dates: Sequence[Any]) -> tuple:
 # Branches
 
 
+def get_successors(graph: nx.DiGraph | ArrayDiGraph, nodes: np.ndarray) -> tuple:
+    """Function to get the successors of some nodes from the adjacency of the graph.
+    Returns the number of successors of every node and the successors of all of them,
+    grouped by node in the order of the edges of the graph."""
+    if isinstance(graph, ArrayDiGraph):
+        positions = graph.get_positions(nodes)
+        starts = graph.out_offsets[positions]
+        counts = graph.out_offsets[positions + 1] - starts
+        edge_positions = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        edge_positions += np.arange(counts.sum())
+
+        return counts, graph.node_ids[graph.out_targets[edge_positions]]
+
+    successors = [list(graph.successors(node)) for node in nodes]
+    counts = np.array([len(node_successors) for node_successors in successors], dtype=np.int64)
+    successors_flat = [successor for node_successors in successors for successor in node_successors]
+
+    return counts, np.array(successors_flat, dtype=nodes.dtype)
+
+
 def get_detail_branches(
-    graph: nx.DiGraph,
-    branches: list,
-    dates_of_creation_dt: list,
-    format_date: str = "%Y-%m-%d",
+    graph: nx.DiGraph | ArrayDiGraph,
+    branches: np.ndarray,
+    branch_days: np.ndarray,
     period: float = 365.2425,
 ) -> dict:
-    """Function to get the local details of branches into a dictionary"""
-    detail_branches = {}
-    for b, branch in enumerate(branches):
-        dict_local: dict[str, Any] = {}
-        sprouts = [edge[1] for edge in graph.edges if branch == edge[0]]
-
-        sprouts_dates_str = [graph.nodes[sprout]["date_of_creation"] for sprout in sprouts]
-        sprouts_dates_dt = [
-            dt.datetime.strptime(date, format_date) if isinstance(date, str) else np.nan
-            for date in sprouts_dates_str
-        ]
-
-        branch_date_of_creation = dates_of_creation_dt[b]
-        if isinstance(branch_date_of_creation, dt.datetime):
-            growing_times_sprouts_dt = [
-                date - branch_date_of_creation if isinstance(date, dt.datetime) else np.nan
-                for date in sprouts_dates_dt
-            ]
-            growing_times_sprouts = [
-                delta.days / period if isinstance(delta, dt.timedelta) else np.nan
-                for delta in growing_times_sprouts_dt
-            ]
-        else:
-            growing_times_sprouts = np.nan
-
-        sic_codes = [graph.nodes[sprout]["sic_codes"] for sprout in sprouts]
-
-        dict_local["sprouts"] = sprouts
-        dict_local["sprouts_dates_of_creation"] = sprouts_dates_dt
-        dict_local["growing_times_sprouts"] = growing_times_sprouts
-        dict_local["sic_codes"] = sic_codes
+    """Function to get the local details of branches as flat arrays, one row per sprout:
+    the branch, the sprout, its date of creation, its growing time since the creation of the
+    branch (NaN if either date is missing) and its SIC codes.
+    branch_days are the dates of creation of the branches as datetime64[D]."""
+    counts, sprouts = get_successors(graph, branches)
+    attributes = get_nodes_attributes(graph, sprouts, ["date_of_creation", "sic_codes"])
+    sprouts_days = get_days(attributes.date_of_creation)
+
+    detail_branches: dict[str, Any] = {}
+    detail_branches["branches"] = np.repeat(branches, counts)
+    detail_branches["sprouts"] = sprouts
+    detail_branches["sprouts_dates_of_creation"] = sprouts_days
+    detail_branches["growing_times_sprouts"] = get_years(
+        sprouts_days - np.repeat(branch_days, counts), period
+    )
+    detail_branches["sic_codes"] = attributes.sic_codes.to_numpy()
 
-        detail_branches[branch] = dict_local
     return detail_branches
 
 
@@ -161,36 +264,24 @@ def get_dict_branches(
 ) -> dict:
     """Function to get the dictionary of all branches"""
     dict_branches: dict[str, Any] = {}
-    dates_subgraph = [graph.nodes[node]["date_of_creation"] for node in list_nodes]
-    dates_subgraph_dt = [
-        dt.datetime.strptime(date, format_date) for date in dates_subgraph if isinstance(date, str)
-    ]
-
-    branches = [
-        node
-        for node in list_nodes
-        if graph.nodes[node]["out_degree"] > 1 and graph.nodes[node]["in_degree"] > 0
-    ]
-    degrees = [graph.nodes[branch]["out_degree"] for branch in branches]
-    dates_of_creation_str = [graph.nodes[branch]["date_of_creation"] for branch in branches]
-    dates_of_creation_dt = [
-        dt.datetime.strptime(date, format_date) if isinstance(date, str) else np.nan
-        for date in dates_of_creation_str
-    ]
+    attributes = get_nodes_attributes(
+        graph, list_nodes, ["date_of_creation", "in_degree", "out_degree"]
+    )
+    days = get_days(attributes.date_of_creation, format_date)
 
-    if len(dates_subgraph_dt) != 0:
-        min_date = min(dates_subgraph_dt)
-        growing_times = [
-            (delta - min_date).days / period if isinstance(delta, dt.datetime) else np.nan
-            for delta in dates_of_creation_dt
-        ]
+    is_branch = ((attributes.out_degree > 1) & (attributes.in_degree > 0)).to_numpy()
+    branches = attributes.index[is_branch].to_numpy()
+    degrees = attributes.out_degree[is_branch].tolist()
+    branch_days = days[is_branch]
 
+    if not np.isnat(days).all():
+        growing_times = get_years(branch_days - days[~np.isnat(days)].min(), period).tolist()
     else:
         growing_times = np.nan
 
-    detail_branches = get_detail_branches(graph, branches, dates_of_creation_dt)
+    detail_branches = get_detail_branches(graph, branches, branch_days, period)
 
-    dict_branches["branches"] = branches
+    dict_branches["branches"] = branches.tolist()
     dict_branches["degrees"] = degrees
     dict_branches["growing_times"] = growing_times
     dict_branches["detail_branches"] = detail_branches
@@ -202,12 +293,14 @@ def get_dict_branches(
 
 
 def get_dict_cluster(graph: nx.DiGraph, list_nodes: Sequence[int | str]) -> dict:
-    """Function to get the dictionary of a subgraph"""
-    in_degrees = np.array([graph.nodes[node]["in_degree"] for node in list_nodes])
-    out_degrees = np.array([graph.nodes[node]["out_degree"] for node in list_nodes])
+    """Function to get the dictionary of a subgraph.
+    The node attributes are read as vectors from the node table of the graph."""
+    attributes = get_nodes_attributes(graph, list_nodes, ["in_degree", "out_degree", "human"])
+    in_degrees = attributes.in_degree.to_numpy()
+    out_degrees = attributes.out_degree.to_numpy()
     degrees = list(zip(in_degrees, out_degrees))
 
-    humans = sum(graph.nodes[node]["human"] for node in list_nodes)
+    humans = sum(attributes.human.tolist())
 
     number_of_nodes = len(list_nodes)
     number_of_roots = len(np.where(in_degrees == 0)[0])
@@ -216,11 +309,12 @@ def get_dict_cluster(graph: nx.DiGraph, list_nodes: Sequence[int | str]) -> dict
     )
     max_length = get_max_length(graph, list_nodes)
 
-    dates_with_nans = get_dates_with_nans(graph, list_nodes)
-    min_date_of_creation, max_date_of_creation = get_min_max_dates(dates_with_nans)
-    growing_time = get_growingtime(dates_with_nans)
+    days = get_days(get_nodes_attributes(graph, list_nodes, ["date_of_creation"]).date_of_creation)
+    dates_with_nans = get_python_dates(days)
+    min_date_of_creation, max_date_of_creation = get_min_max_dates(days)
+    growing_time = get_growingtime(days)
 
-    sic_codes = np.array([graph.nodes[node]["sic_codes"] for node in list_nodes])
+    sic_codes = np.array(get_nodes_attributes(graph, list_nodes, ["sic_codes"]).sic_codes.tolist())
     dict_branches = get_dict_branches(graph, list_nodes)
 
     dict_cluster: dict[str, Any] = {}
@@ -279,3 +373,133 @@ def classify_cluster(dict_cluster: dict) -> dict:
     dict_cluster["class_str"] = classifications[classification]
 
     return dict_cluster
+
+
+# Bulk summaries
+
+
+def classify_clusters(
+    numbers_of_nodes: np.ndarray, numbers_of_roots: np.ndarray, numbers_of_branches: np.ndarray
+) -> np.ndarray:
+    """Function to classify many networks at once, with the same rules as classify_cluster"""
+    conditions = [
+        numbers_of_nodes < 3,
+        (numbers_of_roots == 1) & (numbers_of_branches == 0),
+        (numbers_of_roots > 1) & (numbers_of_branches == 0),
+        (numbers_of_roots == 1) & (numbers_of_branches > 0),
+        (numbers_of_roots > 0) & (numbers_of_branches > 0),
+    ]
+
+    return np.select(conditions, [0, 1, 2, 3, 4], default=-1)
+
+
+def get_component_sums(node_labels: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Function to sum the values of the nodes of every component, given the component of every
+    node, e.g. to count the nodes of every component that meet a condition"""
+    return np.bincount(
+        node_labels, weights=values, minlength=node_labels.max(initial=-1) + 1
+    ).astype(np.int64)
+
+
+def get_cluster_summaries(
+    graph: nx.DiGraph,
+    components: Components,
+    max_small_size: int = 3,
+    format_date: str = "%Y-%m-%d",
+    period: float = 365.2425,
+) -> dict:
+    """Function to get the summaries of all the clusters at once, with reductions over the
+    component of every node. Returns one array per field, indexed by number of cluster, with
+    the dates as datetime64[D] (NaT if missing). The max length is only known for the small
+    clusters, which have at most max_small_size nodes and no undirected cycle, and is -1 for
+    the others."""
+    classifications = ["boring", "bush", "arrow", "tree", "bug", "unclassified"]
+
+    sizes = components.sizes
+    node_labels = np.repeat(np.arange(len(components)), sizes)
+    attributes = get_nodes_attributes(
+        graph, components.nodes, ["human", "in_degree", "out_degree", "date_of_creation"]
+    )
+    in_degrees = attributes.in_degree.to_numpy()
+    out_degrees = attributes.out_degree.to_numpy()
+
+    numbers_of_edges = get_component_sums(node_labels, out_degrees)
+    numbers_of_roots = get_component_sums(node_labels, in_degrees == 0)
+    numbers_of_branches = get_component_sums(node_labels, (in_degrees != 0) & (out_degrees > 1))
+    has_middle = get_component_sums(node_labels, (in_degrees > 0) & (out_degrees > 0)) > 0
+
+    # Small clusters are trees, so their longest path is given by their degrees
+    is_small = (sizes <= max_small_size) & (numbers_of_edges == sizes - 1)
+    max_lengths = np.where(sizes == 1, 0, np.where(has_middle, 2, 1))
+    classes = classify_clusters(sizes, numbers_of_roots, numbers_of_branches)
+
+    days = pd.Series(get_days(attributes.date_of_creation, format_date))
+    min_days = days.groupby(node_labels).min().reindex(range(len(components))).to_numpy()
+    max_days = days.groupby(node_labels).max().reindex(range(len(components))).to_numpy()
+
+    summaries = {}
+    summaries["number_of_nodes"] = sizes
+    summaries["number_of_roots"] = numbers_of_roots
+    summaries["number_of_branches"] = numbers_of_branches
+    summaries["max_length"] = np.where(is_small, max_lengths, -1)
+    summaries["number_of_humans"] = get_component_sums(
+        node_labels, attributes.human.to_numpy(dtype=bool)
+    )
+    summaries["growing_time"] = get_years((max_days - min_days).astype("timedelta64[D]"), period)
+    summaries["min_date_of_creation"] = min_days.astype("datetime64[D]")
+    summaries["max_date_of_creation"] = max_days.astype("datetime64[D]")
+    summaries["class_int"] = classes
+    summaries["class_str"] = np.array(classifications, dtype=object)[classes]
+
+    return summaries
+
+
+def get_small_clusters(
+    graph: nx.DiGraph,
+    components: Components,
+    max_size: int = 3,
+    format_date: str = "%Y-%m-%d",
+    period: float = 365.2425,
+) -> dict:
+    """Function to get the classified dictionaries of the small clusters, computed for all of them
+    at once from get_cluster_summaries. Small clusters have at most max_size nodes and no
+    undirected cycle, so they have no branches. Returns the dictionaries by number of cluster."""
+    summaries = get_cluster_summaries(graph, components, max_size, format_date, period)
+    small = np.flatnonzero(summaries["max_length"] >= 0)
+
+    attributes = get_nodes_attributes(graph, components.nodes, ["date_of_creation", "sic_codes"])
+    dates_dt = get_python_dates(get_days(attributes.date_of_creation, format_date))
+    sic_codes = attributes.sic_codes.tolist()
+    min_dates_dt = get_python_dates(summaries["min_date_of_creation"][small])
+    max_dates_dt = get_python_dates(summaries["max_date_of_creation"][small])
+    empty_detail_branches = get_detail_branches(
+        graph, components.nodes[:0], np.array([], dtype="datetime64[D]"), period
+    )
+
+    dict_clusters = {}
+    for i, k in enumerate(small.tolist()):
+        start, end = components.offsets[k], components.offsets[k + 1]
+        has_dates = not np.isnan(summaries["growing_time"][k])
+        dict_cluster: dict[str, Any] = {}
+        dict_cluster["number_of_nodes"] = int(summaries["number_of_nodes"][k])
+        dict_cluster["number_of_roots"] = int(summaries["number_of_roots"][k])
+        dict_cluster["number_of_branches"] = int(summaries["number_of_branches"][k])
+        dict_cluster["list_of_nodes"] = components.nodes[start:end].tolist()
+        dict_cluster["max_length"] = int(summaries["max_length"][k])
+        dict_cluster["number_of_humans"] = int(summaries["number_of_humans"][k])
+        dict_cluster["dates_of_creation"] = dates_dt[start:end]
+        dict_cluster["growing_time"] = float(summaries["growing_time"][k])
+        dict_cluster["min_date_of_creation"] = min_dates_dt[i]
+        dict_cluster["max_date_of_creation"] = max_dates_dt[i]
+        dict_cluster["sic_codes"] = np.array(sic_codes[start:end])
+        dict_cluster["dict_branches"] = {
+            "branches": [],
+            "degrees": [],
+            "growing_times": [] if has_dates else np.nan,
+            "detail_branches": dict(empty_detail_branches),
+        }
+        dict_cluster["class_int"] = int(summaries["class_int"][k])
+        dict_cluster["class_str"] = summaries["class_str"][k]
+        dict_clusters[k] = dict_cluster
+
+    return dict_clusters
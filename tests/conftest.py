@@ -17,3 +17,100 @@ def init_first_link():
         }
     )
     return first_link
+
+
+@pytest.fixture(scope="function")
+def init_psc_raw():
+    """Returns a small pandas DataFrame shaped like a raw PSC CSV file"""
+    psc_raw = pd.DataFrame(
+        data={
+            "Unnamed: 0.1": [0, 1, 2, 3, 4],
+            "Unnamed: 0": [0, 1, 2, 3, 4],
+            "natures_of_control": [
+                "['ownership-of-shares-25-to-50-percent']",
+                "['voting-rights-25-to-50-percent']",
+                "['ownership-of-shares-75-to-100-percent', 'voting-rights-75-to-100-percent']",
+                None,
+                "['ownership-of-shares-50-to-75-percent-as-firm']",
+            ],
+            "name": ["Alice Ecila", "Bob Bob", "Acme Ltd", "Dave Evade", "Saltd Holdings LTD"],
+            "kind": [
+                "individual-person-with-significant-control",
+                "individual-person-with-significant-control",
+                "corporate-entity-person-with-significant-control",
+                "individual-person-with-significant-control",
+                "corporate-entity-person-with-significant-control",
+            ],
+            "date_of_birth.year": [1970.0, 1980.0, None, 1990.0, None],
+            "date_of_birth.month": [1.0, 2.0, None, 3.0, None],
+            "company_number": ["1234", "SC005678", "00009012", "3456", "789"],
+        }
+    )
+    return psc_raw
+
+
+@pytest.fixture(scope="function")
+def init_corporate_links():
+    """Returns PSCs, companies and first links where a human owns company a,
+    which owns company b, which owns company c"""
+    companies = pd.DataFrame(
+        data={
+            "company_number": ["00000001", "00000002", "00000003"],
+            "company_name": ["a limited", "b limited", "c limited"],
+        }
+    )
+    psc = pd.DataFrame(
+        data={
+            "company_number": ["00000002", "00000003"],
+            "name": ["a limited", "b limited"],
+            "kind": ["corporate-entity-person-with-significant-control"] * 2,
+        }
+    )
+    small_firstlink = pd.DataFrame(
+        data={
+            "name": ["john smith"],
+            "company_name": ["a limited"],
+            "company_number": ["00000001"],
+            "idx_human": [1.0],
+            "idx_company": [2.0],
+        }
+    )
+    return psc, companies, small_firstlink
+
+
+@pytest.fixture(scope="function")
+def init_sspsc():
+    """Returns PSCs with SSPSCs, companies, first links and second links where company 1
+    is already indexed and companies 4 (two SSPSCs) and 5 (one SSPSC) are not"""
+    companies = pd.DataFrame(
+        data={
+            "company_number": ["00000001", "00000004", "00000005"],
+            "company_name": ["a limited", "d limited", "e limited"],
+        }
+    )
+    psc = pd.DataFrame(
+        data={
+            "company_number": ["00000004", "00000001", "00000005", "00000004"],
+            "name": [None] * 4,
+            "kind": ["super-secure-person-with-significant-control"] * 4,
+        }
+    )
+    small_firstlink = pd.DataFrame(
+        data={
+            "name": ["john smith"],
+            "company_name": ["a limited"],
+            "company_number": ["00000001"],
+            "idx_human": [1.0],
+            "idx_company": [2.0],
+        }
+    )
+    psc_companies = pd.DataFrame(
+        data={
+            "company_number": ["00000009"],
+            "company_name": ["x limited"],
+            "company_name_2": ["y limited"],
+            "idx_company": [3.0],
+            "idx_company_2": [4.0],
+        }
+    )
+    return psc, companies, small_firstlink, psc_companies
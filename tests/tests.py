@@ -1,7 +1,80 @@
 """Pytest tests"""
 
+import datetime as dt
+import json
+import zipfile
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
 from tqdm import tqdm
 
+from rama.processing.array_graph import ArrayDiGraph
+from rama.processing.cache import (
+    get_cache_key,
+    get_file_hash,
+    load_processed,
+    save_processed,
+)
+from rama.processing.cleaning import clean_psc
+from rama.processing.cluster_view import LazyClusters
+from rama.processing.company_index import resolve_company_names
+from rama.processing.components import get_components
+from rama.processing.helper_functions import get_company_company_link
+from rama.processing.identity import get_identity_merge_map
+from rama.processing.lists import (
+    companies_api_columns,
+    company_kinds,
+    other_kinds,
+    psc_columns,
+    psc_identification_columns,
+)
+from rama.processing.load_database_pipeline import (
+    get_edge_list,
+    get_graph,
+    get_sspsc,
+    process_database,
+)
+from rama.processing.memory import compact_frames
+from rama.processing.natures import (
+    decode_ownership,
+    encode_natures_of_control,
+    get_ownership_weights,
+)
+from rama.processing.node_attributes import (
+    NodeValueLists,
+    get_date_column,
+    get_node_attribute,
+    get_nodes_attributes,
+    get_unique_values_per_node,
+    get_value_lists,
+    set_node_table,
+)
+from rama.processing.normalise import normalise_company_names, normalise_company_numbers
+from rama.processing.parallel_clusters import get_dict_clusters
+from rama.processing.reading import (
+    is_jsonl,
+    iter_psc_jsonl,
+    read_parts_parallel,
+    read_psc,
+    read_psc_part,
+)
+from rama.processing.registry import EntityRegistry, get_node_keys
+from rama.processing.storage import load_initialised, save_initialised
+from rama.processing.study_graphs import (
+    classify_cluster,
+    find_all_paths,
+    get_dates_with_nans,
+    get_days,
+    get_dict_branches,
+    get_dict_cluster,
+    get_growingtime,
+    get_max_length,
+    get_min_max_dates,
+    keep_longest_path,
+)
+
 
 def test_humans(init_first_link):
     "Testing humans correctly indexed"
@@ -40,3 +113,774 @@ def test_companies_number(init_first_link):
         ):
             list_nonpass.append(idx_c)
     return list_nonpass
+
+
+def test_read_psc_chunks(init_psc_raw, tmp_path):
+    "Testing chunked reading gives the same PSCs as reading the whole file"
+    init_psc_raw.to_csv(tmp_path / "psc.csv", index=False)
+
+    expected = clean_psc([pd.read_csv(tmp_path / "psc.csv")]).reset_index(drop=True)
+    streamed = read_psc(str(tmp_path) + "/", "psc.csv", chunksize=2)
+
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+
+
+def test_cache_roundtrip(init_psc_raw, tmp_path):
+    "Testing processed dataframes come back unchanged from the cache"
+    psc = clean_psc([init_psc_raw])
+    psc["natures_of_control"] = psc.natures_of_control.apply(lambda x: x.split("'")[1::2])
+    edge_list = pd.DataFrame(data={"index": [0, 1], "i": [1, 2], "j": [3, 3]})
+    list_dfs = [psc.drop(columns="natures_of_control"), psc, psc, psc]
+
+    assert load_processed(str(tmp_path / "key")) is None
+    save_processed(str(tmp_path / "key"), list_dfs, edge_list)
+    cached_dfs, cached_edge_list = load_processed(str(tmp_path / "key"))
+
+    pd.testing.assert_frame_equal(cached_edge_list, edge_list)
+    pd.testing.assert_frame_equal(cached_dfs[1], psc)
+
+    # The cache key changes with the contents of the registry
+    registry_path = str(tmp_path / "registry.parquet")
+    keys = []
+    for registry_keys in [[], ["company:00000001"], ["company:00000001"], ["company:00000002"]]:
+        registry = EntityRegistry(registry_path)
+        registry.lookup_or_assign(registry_keys)
+        registry.save()
+        keys.append(
+            get_cache_key(str(tmp_path) + "/", [], [], registry_hash=get_file_hash(registry_path))
+        )
+    assert keys[0] != keys[1] and keys[1] != keys[3]
+
+
+def test_read_parts_parallel(init_psc_raw, tmp_path):
+    "Testing parallel reading of part files gives the same PSCs as the serial path"
+    init_psc_raw.iloc[:3].to_csv(tmp_path / "psc_1.csv", index=False)
+    init_psc_raw.iloc[3:].to_csv(tmp_path / "psc_2.csv", index=False)
+    filenames = ["psc_1.csv", "psc_2.csv"]
+
+    expected = clean_psc(
+        [pd.read_csv(tmp_path / name, dtype={"company_number": str}) for name in filenames]
+    )
+    list_pscs, _ = read_parts_parallel(str(tmp_path) + "/", filenames, [], n_workers=2)
+
+    pd.testing.assert_frame_equal(
+        clean_psc(list_pscs).reset_index(drop=True),
+        expected.reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_iter_psc_jsonl(tmp_path):
+    "Testing the JSON lines snapshot is flattened into psc_columns"
+    records = [
+        {
+            "company_number": "01234567",
+            "data": {
+                "kind": "individual-person-with-significant-control",
+                "name": "Mr John Smith",
+                "name_elements": {"surname": "Smith", "forename": "John"},
+                "date_of_birth": {"year": 1970, "month": 5},
+                "natures_of_control": ["ownership-of-shares-25-to-50-percent"],
+                "links": {"self": "/company/01234567/persons-with-significant-control"},
+            },
+        },
+        {"data": {"kind": "totals#persons-of-significant-control-snapshot"}},
+    ]
+    with zipfile.ZipFile(tmp_path / "psc.zip", "w") as zip_file:
+        # Blank lines, e.g. a trailing empty line, are skipped
+        zip_file.writestr(
+            "psc.txt", "\n".join(json.dumps(record) for record in records) + "\n\n  \n"
+        )
+
+    batches = list(iter_psc_jsonl(str(tmp_path) + "/", "psc.zip"))
+
+    assert len(batches) == 1
+    assert list(batches[0].columns) == psc_columns + psc_identification_columns
+    row = batches[0].iloc[0]
+    assert row["company_number"] == "01234567"
+    assert row["name_elements.surname"] == "Smith"
+    assert row["date_of_birth.year"] == 1970.0
+    assert row["natures_of_control"] == "['ownership-of-shares-25-to-50-percent']"
+    assert pd.isna(row["ceased_on"])
+
+    # The format is sniffed from the contents, so zipped or .txt CSV parts are read as CSV
+    batches[0].to_csv(tmp_path / "psc.txt", index=False)
+    with zipfile.ZipFile(tmp_path / "psc_csv.zip", "w") as zip_file:
+        zip_file.write(tmp_path / "psc.txt", "psc.csv")
+    assert is_jsonl(str(tmp_path / "psc.zip"))
+    assert not is_jsonl(str(tmp_path / "psc.txt"))
+    assert not is_jsonl(str(tmp_path / "psc_csv.zip"))
+    psc_csv = read_psc_part(str(tmp_path) + "/", "psc_csv.zip")
+    psc_jsonl = read_psc_part(str(tmp_path) + "/", "psc.zip")
+    pd.testing.assert_frame_equal(psc_csv, psc_jsonl, check_dtype=False)
+
+
+def test_normalise_company_numbers():
+    "Testing company numbers are padded with 0s after their prefix"
+    numbers = pd.Series(["123", "SC123", " sc000123 ", "12345678", np.nan])
+    normalised = normalise_company_numbers(numbers)
+
+    assert normalised[:4].tolist() == ["00000123", "SC000123", "SC000123", "12345678"]
+    assert pd.isna(normalised[4])
+    assert normalise_company_numbers(numbers, as_category=True).dtype == "category"
+
+
+def test_normalise_company_names():
+    "Testing legal suffixes are only replaced as whole words at the end of the names"
+    names = pd.Series(
+        [
+            "Acme Ltd",
+            "Saltd Holdings LTD.",
+            "Foo Public Limited Company",
+            "Smith & Co Ltd",
+            "The Co-operative Group Limited",
+            "Example.co.uk Ltd",
+            "CO-OP LTD",
+            "Co Holdings Ltd",
+        ]
+    )
+
+    assert normalise_company_names(names).tolist() == [
+        "acme limited",
+        "saltd holdings limited",
+        "foo plc",
+        "smith & company limited",
+        "the co-operative group limited",
+        "example.co.uk limited",
+        "co-op limited",
+        "co holdings limited",
+    ]
+
+
+def test_natures_mask():
+    "Testing natures of control are encoded once and give the ownership and weight"
+    natures = pd.Series(
+        [
+            "['ownership-of-shares-25-to-50-percent', 'voting-rights-25-to-50-percent']",
+            "['ownership-of-shares-75-to-100-percent-as-firm']",
+            "['ownership-of-shares-25-to-50-percent', 'ownership-of-shares-50-to-75-percent']",
+            "['significant-influence-or-control']",
+            "['ownership-of-shares-25-to-50-percent', 'voting-rights-25-to-50-percent']",
+        ]
+    )
+    masks = encode_natures_of_control(natures)
+
+    assert masks[0] == masks[4]
+    assert decode_ownership(masks)[:2] == [
+        ["ownership-of-shares-25-to-50-percent"],
+        ["ownership-of-shares-75-to-100-percent-as-firm"],
+    ]
+    np.testing.assert_array_equal(get_ownership_weights(masks), [0.25, 0.75, np.nan, np.nan, 0.25])
+
+
+def test_compact_frames(init_psc_raw):
+    "Testing compact dtypes keep the values and report the bytes saved"
+    psc = clean_psc([init_psc_raw])
+    psc["idx_human"] = [1.0, np.nan, 3.0]
+    frames, report = compact_frames({"psc": psc})
+
+    assert frames["psc"].kind.dtype == "category"
+    assert frames["psc"].idx_human.dtype == "UInt32"
+    assert frames["psc"]["date_of_birth.year"].dtype == "UInt16"
+    assert frames["psc"].kind.tolist() == psc.kind.tolist()
+    assert report.loc["psc", "bytes_saved"] > 0
+
+
+def test_company_company_link(init_corporate_links):
+    "Testing a company gets the same index as owner and as owned company"
+    psc, companies, small_firstlink = init_corporate_links
+    psc_companies = get_company_company_link(psc, companies, small_firstlink, company_kinds)
+    psc_companies = psc_companies.set_index("company_number")
+
+    assert psc_companies.loc["00000002", "idx_company"] == 2
+    assert (
+        psc_companies.loc["00000002", "idx_company_2"]
+        == psc_companies.loc["00000003", "idx_company"]
+    )
+    assert psc_companies.idx_company_2.nunique() == 2
+
+
+def test_entity_registry(tmp_path):
+    "Testing registry ids are stable across saves and new keys get new ids"
+    filename = str(tmp_path / "registry.parquet")
+    registry = EntityRegistry(filename)
+    ids = registry.lookup_or_assign(["company:00000001", "human:a|1970.0|1.0", "company:00000001"])
+    assert ids.tolist() == [1, 2, 1]
+    registry.save()
+
+    registry = EntityRegistry(filename)
+    ids = registry.lookup_or_assign(["company:00000002", "human:a|1970.0|1.0"])
+    assert ids.tolist() == [3, 2]
+    assert len(registry) == 3
+
+
+def test_registry_node_keys():
+    "Testing owners are keyed by company number and merged humans by any of their variants"
+    companies = pd.DataFrame({"company_number": ["00000007"], "company_name": ["x limited"]})
+    merged_firstlink = pd.DataFrame(
+        {
+            "name": ["john smith", "mr john smith"],
+            "date_of_birth.year": [1970.0, 1970.0],
+            "date_of_birth.month": [5.0, 5.0],
+            "idx_human": [1.0, 1.0],
+            "idx_company": [2.0, 2.0],
+            "company_number": ["00000001", "00000001"],
+        }
+    )
+    psc_companies = pd.DataFrame(
+        {
+            "company_number": ["00000001"],
+            "company_name": ["x limited"],
+            "idx_company": [3.0],
+            "idx_company_2": [2.0],
+        }
+    )
+    sspsc = pd.DataFrame({"company_number": [], "idx_company": [], "i": []})
+
+    node_keys = get_node_keys(merged_firstlink, psc_companies, sspsc, companies)
+    reversed_keys = get_node_keys(merged_firstlink[::-1], psc_companies, sspsc, companies)
+    pd.testing.assert_frame_equal(node_keys, reversed_keys)
+    assert node_keys.drop_duplicates("node").key.tolist() == [
+        "human:john smith|1970.0|5.0",
+        "company:00000001",
+        "company:00000007",
+    ]
+
+    # A human first seen as a variant keeps its id, and an owner keeps its id once owned
+    registry = EntityRegistry()
+    ids = registry.get_node_ids(node_keys)
+    node_keys_later = pd.DataFrame(
+        {"node": [1.0, 2.0], "key": ["human:mr john smith|1970.0|5.0", "company:00000007"]}
+    )
+    assert registry.get_node_ids(node_keys_later).tolist() == [ids[1.0], ids[3.0]]
+
+
+def test_registry_merges_nodes():
+    "Testing nodes of the same human or company get one registry id through process_database"
+    human = "individual-person-with-significant-control"
+    psc = pd.DataFrame(
+        {
+            "natures_of_control": ["['ownership-of-shares-25-to-50-percent']"] * 4,
+            "name": ["John Smith"] * 3 + ["A Limited"],
+            "kind": [human] * 3 + ["corporate-entity-person-with-significant-control"],
+            "date_of_birth.year": [1970.0] * 3 + [np.nan],
+            "date_of_birth.month": [1.0] * 3 + [np.nan],
+            "company_number": ["00000001", "00000002", "00000003", "00000004"],
+        }
+    ).reindex(columns=psc_columns)
+    companies = pd.DataFrame(
+        {
+            "company_number": ["00000001", "00000002", "00000003", "00000004"],
+            "company_name": ["a limited", "b limited", "c limited", "d limited"],
+        }
+    ).reindex(columns=companies_api_columns)
+
+    registry = EntityRegistry()
+    _, edge_list = process_database([psc], [companies], registry=registry)
+
+    # John Smith owns companies 1, 2 and 3, and company 1 owns company 4
+    assert sorted(zip(edge_list.i, edge_list.j)) == [(1, 2), (1, 3), (1, 4), (2, 5)]
+    assert registry.lookup_or_assign(["name:a limited"]).tolist() == [2]
+
+
+def test_identity_merge_map():
+    "Testing variants of a name are merged inside a surname and date of birth block only"
+    psc_humans = pd.DataFrame(
+        {
+            "name": ["mr john smith", "john a smith", "j smith", "jane smith", "john smith"],
+            "name_elements.surname": ["Smith", "Smith", np.nan, "Smith", "Smith"],
+            "date_of_birth.year": [1970.0, 1970.0, 1970.0, 1970.0, 1971.0],
+            "date_of_birth.month": [1.0, 1.0, 1.0, 1.0, 1.0],
+        }
+    )
+    identities = get_identity_merge_map(psc_humans)
+
+    # 'j' could be john or jane, and the last john smith has another date of birth
+    assert identities.tolist() == [0, 0, 1, 2, 3]
+
+    # Humans without a date of birth are not compared, however many share a surname
+    n_humans = 20_000
+    psc_humans = pd.DataFrame(
+        {
+            "name": [f"mr name{i} smith" for i in range(n_humans)] + ["name0 smith"],
+            "name_elements.surname": ["Smith"] * (n_humans + 1),
+            "date_of_birth.year": [np.nan] * (n_humans + 1),
+            "date_of_birth.month": [np.nan] * (n_humans + 1),
+        }
+    )
+    identities = get_identity_merge_map(psc_humans)
+    assert identities.tolist() == list(range(n_humans)) + [0]
+
+
+def test_resolve_company_names():
+    "Testing corporate PSCs are resolved by previous name and by registration number"
+    companies = pd.DataFrame(
+        {
+            "company_number": ["00000001", "00000002"],
+            "company_name": ["new name limited", "other limited"],
+            "previous_company_names": [
+                str([{"name": "OLD NAME LTD", "ceased_on": "2020-01-01"}]),
+                np.nan,
+            ],
+        }
+    )
+    names = pd.Series(
+        [
+            "old name limited",
+            "unknown limited",
+            "other limited",
+            "foreign limited",
+            "foreign limited",
+        ]
+    )
+    registration_numbers = pd.Series([np.nan, "2", "1", "1", "2"])
+    countries_registered = pd.Series([np.nan, "England", np.nan, "England", "Luxembourg"])
+    places_registered = pd.Series([np.nan, np.nan, "Companies House", np.nan, "RCS Luxembourg"])
+    resolved = resolve_company_names(
+        names, registration_numbers, companies, countries_registered, places_registered
+    )
+
+    # A registration number contradicting a known name, or from a foreign registry, is not used
+    assert resolved.tolist() == [
+        "new name limited",
+        "other limited",
+        "other limited",
+        "new name limited",
+        "foreign limited",
+    ]
+    assert resolve_company_names(names, registration_numbers, companies)[1] == "unknown limited"
+
+
+def get_sspsc_reference(psc, companies, small_firstlink, psc_companies):
+    "Previous implementation of get_sspsc, with a join per lookup"
+    sspsc = psc.loc[psc.kind.isin(other_kinds)].copy()
+    company_numbers_sspsc = sspsc.company_number.unique()
+
+    df_names = companies.loc[
+        companies.company_number.isin(company_numbers_sspsc),
+        ["company_number", "company_name"],
+    ]
+    company_names_sspsc = df_names.company_name.unique()
+
+    sspsc = (
+        sspsc.set_index("company_number").join(df_names.set_index("company_number")).reset_index()
+    )
+
+    min_ = int(psc_companies["idx_company_2"].max())
+    max_ = min_ + len(sspsc)
+    sspsc.loc[:, "i"] = [i + 1 for i in range(min_, max_)]
+
+    a = small_firstlink.loc[small_firstlink.company_number.isin(company_numbers_sspsc)]
+    b = psc_companies.loc[psc_companies.company_number.isin(company_numbers_sspsc)]
+    c = psc_companies.loc[psc_companies.company_name.isin(company_names_sspsc)]
+    d = psc_companies.loc[psc_companies.company_name_2.isin(company_names_sspsc)]
+
+    for df in [a, b]:
+        if len(df) > 0:
+            sspsc = (
+                sspsc.set_index("company_number")
+                .join(df.set_index("company_number")["idx_company"].drop_duplicates())
+                .reset_index()
+            )
+
+    for df in [c, d]:
+        if len(df) > 0:
+            sspsc = (
+                sspsc.set_index("company_name")
+                .join(df.set_index("company_name")["idx_company"].drop_duplicates())
+                .reset_index()
+            )
+
+    if "idx_company" not in sspsc.columns:
+        sspsc["idx_company"] = np.nan
+
+    duplicated_companies = sspsc.loc[sspsc.idx_company.isna(), :].duplicated(
+        subset="company_number"
+    )
+    all_duplicated_companies = sspsc.loc[sspsc.idx_company.isna(), :].duplicated(
+        subset="company_number", keep=False
+    )
+    companies_bool = np.logical_or(duplicated_companies, ~all_duplicated_companies)
+    s = sspsc.loc[~sspsc.idx_company.isna(), :].idx_company.isna()
+    companies_bool = pd.concat([companies_bool, s]).sort_index()
+
+    idx_nan = sspsc.drop_duplicates("company_number").idx_company.isna()
+    min_ = max_
+    max_ = min_ + sum(idx_nan)
+    sspsc.loc[companies_bool.values, ["idx_company"]] = [i + 1 for i in range(min_, max_)]
+    sspsc["idx_company"].fillna(
+        sspsc.groupby("company_number")["idx_company"].transform("first"), inplace=True
+    )
+
+    return sspsc
+
+
+def test_sspsc_equivalence(init_sspsc):
+    "Testing the single lookup get_sspsc gives the same links as the previous implementation"
+    psc, companies, small_firstlink, psc_companies = init_sspsc
+    sspsc = get_sspsc(psc, companies, small_firstlink, psc_companies)
+    pd.testing.assert_frame_equal(
+        sspsc, get_sspsc_reference(psc, companies, small_firstlink, psc_companies)
+    )
+    assert sspsc.idx_company.tolist() == [10.0, 2.0, 9.0, 10.0]
+
+    # Company 4 has the same name as company 7, owned by company 3, but is not company 7
+    psc_4 = psc.loc[psc.company_number == "00000004"]
+    companies_duplicated = pd.concat(
+        [companies, pd.DataFrame({"company_number": ["00000007"], "company_name": ["d limited"]})]
+    )
+    psc_companies_duplicated = psc_companies.assign(company_name_2="d limited")
+    sspsc = get_sspsc(psc_4, companies_duplicated, small_firstlink, psc_companies_duplicated)
+    pd.testing.assert_frame_equal(
+        sspsc,
+        get_sspsc_reference(psc_4, companies_duplicated, small_firstlink, psc_companies_duplicated),
+        check_like=True,
+    )
+    assert sspsc.idx_company.tolist() == [7.0, 7.0]
+
+    # Company 1 found by name in psc_companies instead of by number in small_firstlink
+    small_firstlink["company_number"] = "00000008"
+    psc_companies["company_name"] = "a limited"
+    sspsc = get_sspsc(psc, companies, small_firstlink, psc_companies)
+    pd.testing.assert_frame_equal(
+        sspsc,
+        get_sspsc_reference(psc, companies, small_firstlink, psc_companies),
+        check_like=True,
+    )
+    assert sspsc.idx_company.tolist() == [10.0, 3.0, 9.0, 10.0]
+
+
+def test_array_graph():
+    "Testing the array graph gives the same neighbours, degrees and components as networkx"
+    edge_list = pd.DataFrame({"i": [1.0, 1.0, 2.0, 5.0, 1.0], "j": [2.0, 3.0, 3.0, 6.0, 2.0]})
+    graph = ArrayDiGraph.from_edge_list(edge_list)
+    graph_nx = nx.from_edgelist(
+        list(zip(edge_list.i.astype(int), edge_list.j.astype(int))), create_using=nx.DiGraph
+    )
+
+    assert sorted(graph.nodes) == sorted(graph_nx.nodes)
+    assert sorted(graph.edges) == sorted(graph_nx.edges)
+    assert graph.successors(1) == [2, 3]
+    assert graph.predecessors(3) == [1, 2]
+    assert dict(graph.in_degree) == dict(graph_nx.in_degree)
+    assert graph.out_degree(1) == 2
+    components = get_components(
+        graph.node_ids[graph.edge_sources], graph.node_ids[graph.out_targets]
+    )
+    assert [component.tolist() for component in components] == [[1, 2, 3], [5, 6]]
+
+    graph.set_node_attributes({1: True, 2: False}, "human")
+    graph.set_edge_attributes({(1, 3): 0.5, (2, 3): 0.25}, "weight")
+    assert graph.nodes[1]["human"] is True
+    assert np.isnan(graph.nodes[6]["human"])
+    assert graph.edges[(2, 3)]["weight"] == 0.25
+
+    subgraph = graph.subgraph([1, 3])
+    assert list(subgraph.edges(data=True)) == [(1, 3, {"weight": 0.5})]
+
+
+def test_node_table():
+    "Testing the node table is set on both graph backends and read back for a set of nodes"
+    edge_list = pd.DataFrame({"i": [1, 2], "j": [2, 3]})
+    node_table = pd.DataFrame(
+        {"human": [True, False, False], "in_degree": [0, 1, 1]}, index=[1, 2, 3]
+    )
+    graph_nx = nx.from_edgelist(list(zip(edge_list.i, edge_list.j)), create_using=nx.DiGraph)
+    graph_array = ArrayDiGraph.from_edge_list(edge_list)
+
+    for graph in [graph_nx, graph_array]:
+        set_node_table(graph, node_table)
+        assert get_node_attribute(graph, 1, "human") and not get_node_attribute(graph, 2, "human")
+        attributes = get_nodes_attributes(graph, [3, 1], ["human"])
+        assert attributes.human.tolist() == [False, True]
+    assert graph_array.nodes[1]["human"] is True
+
+    # A nx.DiGraph only gets per-node dictionaries when asked
+    assert graph_nx.nodes[1] == {}
+    set_node_table(graph_nx, node_table, node_dicts=True)
+    assert graph_nx.nodes[1]["human"] is True
+
+    # Graphs without a node table are read from their node attributes
+    graph_copy = nx.DiGraph(graph_nx.subgraph([1, 2]))
+    graph_copy.graph = {}
+    assert get_nodes_attributes(graph_copy, [2], ["in_degree"]).in_degree.tolist() == [1]
+
+
+def test_unique_values_per_node():
+    "Testing the unique non-null values of every node are grouped in order of appearance"
+    values = pd.Series(
+        ["Wales", np.nan, "England", "Wales", "Wales", np.nan], index=[3, 3, 3, 3, 1, 2]
+    )
+    nodes = pd.Index([1, 2, 3, 4])
+
+    offsets, node_values = get_unique_values_per_node(values, nodes)
+    assert offsets.tolist() == [0, 1, 1, 3, 3]
+    lists = get_value_lists(offsets, node_values)
+    assert lists[0] == ["Wales"] and lists[2] == ["Wales", "England"]
+    assert np.isnan(lists[1][0]) and np.isnan(lists[3][0])
+
+    # The lists are kept as offsets and codes on the graph and only expanded when read
+    node_lists = NodeValueLists(offsets, node_values)
+    assert node_lists[2] == ["Wales", "England"]
+    assert node_lists[np.array([2, -1, 0])].to_lists()[::2] == [["Wales", "England"], ["Wales"]]
+    for graph in [nx.DiGraph([(1, 2), (3, 4)]), ArrayDiGraph.from_arrays([1, 3], [2, 4])]:
+        set_node_table(graph, pd.DataFrame(index=nodes), node_lists={"country": node_lists})
+        attributes = get_nodes_attributes(graph, [3, 1], ["country"])
+        assert attributes.country.tolist() == [["Wales", "England"], ["Wales"]]
+        assert get_node_attribute(graph, 3, "country") == ["Wales", "England"]
+    assert graph.nodes[3]["country"] == ["Wales", "England"]
+
+
+def test_edge_list_ownership():
+    "Testing the ownership and weight are aligned with the edgelist and set in bulk on the graph"
+    masks = encode_natures_of_control(
+        pd.Series(
+            [
+                "['ownership-of-shares-50-to-75-percent']",
+                "['ownership-of-shares-25-to-50-percent', 'ownership-of-shares-50-to-75-percent']",
+                "['ownership-of-shares-75-to-100-percent']",
+            ]
+        )
+    )
+    small_firstlink = pd.DataFrame(
+        {"idx_human": [1, 1], "idx_company": [3, 3], "natures_mask": masks[[0, 2]]}
+    )
+    psc_companies = pd.DataFrame(
+        {"idx_company": [3], "idx_company_2": [4], "natures_mask": masks[[1]]}
+    )
+    sspsc = pd.DataFrame({"i": [5], "idx_company": [4]})
+
+    edge_list = get_edge_list(small_firstlink, psc_companies, sspsc)
+    # Repeated edges take their first row, conflicting bands and SSPSCs have no weight
+    assert edge_list.weight.tolist()[:2] == [0.5, 0.5]
+    assert np.isnan(edge_list.weight.tolist()[2:]).all()
+
+    for backend in ["networkx", "array"]:
+        graph = get_graph(edge_list, backend)
+        assert graph.edges[(1, 3)]["ownership"] == ["ownership-of-shares-50-to-75-percent"]
+        assert np.isnan(graph.edges[(3, 4)]["weight"])
+
+
+def test_save_load_initialised(tmp_path):
+    "Testing the outputs of initialise are saved and memory-mapped back"
+    graph = nx.DiGraph([(1, 2), (1, 3), (4, 5)])
+    nx.set_edge_attributes(graph, {(1, 2): 0.5, (1, 3): 0.25, (4, 5): np.nan}, "weight")
+    node_table = pd.DataFrame(
+        {
+            "human": [True, False, False, True, False],
+            "date_of_creation": [np.nan, "2010-01-01", "2012-06-30", np.nan, np.nan],
+            "sic_codes": [np.nan, "1234", "1234,5678", np.nan, np.nan],
+            "in_degree": [0, 1, 1, 0, 1],
+            "out_degree": [2, 0, 0, 1, 0],
+        },
+        index=[1, 2, 3, 4, 5],
+    )
+    countries = pd.Series(["England", "England", "Wales", "England"], index=[1, 3, 3, 4])
+    node_lists = {
+        "country": NodeValueLists(*get_unique_values_per_node(countries, node_table.index))
+    }
+    set_node_table(graph, node_table, node_lists=node_lists)
+    connected_components = [{1, 2, 3}, {4, 5}]
+    dict_cluster = {
+        k: classify_cluster(get_dict_cluster(graph, list(component)))
+        for k, component in enumerate(connected_components)
+    }
+
+    save_initialised(str(tmp_path / "initialised"), graph, connected_components, dict_cluster)
+    loaded_graph, loaded_components, loaded_clusters = load_initialised(
+        str(tmp_path / "initialised")
+    )
+
+    assert isinstance(loaded_graph.out_targets, np.memmap)
+    assert sorted(loaded_graph.edges) == sorted(graph.edges)
+    assert loaded_graph.edges[(1, 2)]["weight"] == 0.5
+    assert loaded_graph.nodes[3]["sic_codes"] == "1234,5678"
+    assert loaded_graph.nodes[3]["country"] == ["England", "Wales"]
+    sic_codes = loaded_graph.graph["node_table"].sic_codes
+    assert isinstance(sic_codes.cat.codes.to_numpy().base, np.memmap)
+    countries = loaded_graph.graph["node_lists"]["country"]
+    assert isinstance(countries.offsets, np.memmap)
+    assert isinstance(countries.node_values.codes.base, np.memmap)
+    assert [set(component) for component in loaded_components] == connected_components
+    assert loaded_clusters[0]["min_date_of_creation"] == dict_cluster[0]["min_date_of_creation"]
+    assert loaded_clusters[0]["growing_time"] == dict_cluster[0]["growing_time"]
+    assert loaded_clusters[1]["list_of_nodes"] == dict_cluster[1]["list_of_nodes"]
+    assert loaded_clusters[1]["class_str"] == dict_cluster[1]["class_str"]
+    assert isinstance(loaded_clusters, LazyClusters)
+    assert loaded_clusters[0]["dict_branches"].keys() == dict_cluster[0]["dict_branches"].keys()
+    assert (0, "dict_branches") in loaded_clusters.cache
+
+
+def test_components():
+    "Testing the components are sorted by size and smallest node, with sorted node slices"
+    components = get_components(np.array([9, 1, 7, 3, 7]), np.array([8, 2, 7, 4, 2]))
+
+    assert components.sizes.tolist() == [3, 2, 2]
+    assert [component.tolist() for component in components] == [[1, 2, 7], [3, 4], [8, 9]]
+    assert components.get_component(9) == 2
+    assert components[-1].tolist() == [8, 9]
+
+
+def test_max_length():
+    "Testing the max length of a path, with cycles condensed"
+    graph = nx.DiGraph([(1, 2), (2, 3), (3, 1), (3, 4), (5, 5), (6, 7), (7, 8), (6, 8)])
+
+    assert get_max_length(graph, [1, 2, 3, 4]) == 3
+    assert get_max_length(graph, [5]) == 1
+    assert get_max_length(graph, [6, 7, 8]) == 2
+
+    # Same lengths as the longest of all the paths found by find_all_paths on acyclic graphs,
+    # with nodes owning themselves
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        n_nodes = rng.integers(1, 9)
+        graph = nx.DiGraph()
+        graph.add_nodes_from(range(n_nodes))
+        graph.add_edges_from(
+            (i, j) for i in range(n_nodes) for j in range(i, n_nodes) if rng.random() < 0.3
+        )
+        list_nodes = list(graph.nodes)
+        paths = [path for node in list_nodes for path in find_all_paths(graph, node)]
+        assert get_max_length(graph, list_nodes) == len(keep_longest_path(paths)[0]) - 1
+
+    # find_all_paths recurses without end on this cycle, condensed in a path of length 2
+    graph = nx.DiGraph([(0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1)])
+    with pytest.raises(RecursionError):
+        find_all_paths(graph, 0)
+    assert get_max_length(graph, [0, 1, 2]) == 2
+
+
+def test_dates():
+    "Testing the date stats over parsed dates, strings and Python datetimes, with missing dates"
+    days = get_days(pd.Series(["2010-01-01", np.nan, "2012-06-30"]))
+    dates = [dt.datetime(2012, 6, 30), np.nan, dt.datetime(2010, 1, 1)]
+
+    assert days.dtype == "datetime64[D]" and np.isnat(days[1])
+    assert get_growingtime(days) == get_growingtime(dates) == 911 / 365.2425
+    assert get_min_max_dates(days) == (dt.datetime(2010, 1, 1), dt.datetime(2012, 6, 30))
+    assert np.isnan(get_growingtime(get_days([np.nan])))
+
+    dates_of_creation = get_date_column(pd.Series(["2010-01-01", np.nan, "2012-06-30"]))
+    node_table = pd.DataFrame({"date_of_creation": dates_of_creation.to_numpy()}, index=[1, 2, 3])
+    graphs = [nx.DiGraph([(1, 2), (2, 3)]), ArrayDiGraph.from_arrays([1, 2], [2, 3])]
+    for graph in graphs:
+        set_node_table(graph, node_table)
+    for graph in graphs + [graphs[1].to_networkx()]:
+        assert get_node_attribute(graph, 1, "date_of_creation") == pd.Timestamp("2010-01-01")
+        assert get_node_attribute(graph, 2, "date_of_creation") is pd.NaT
+        assert get_dates_with_nans(graph, [3, 1]) == dates[::2]
+    assert graphs[1].nodes[1]["date_of_creation"] == pd.Timestamp("2010-01-01")
+    assert graphs[1].nodes[2]["date_of_creation"] is pd.NaT
+
+
+def test_detail_branches():
+    "Testing the sprouts of the branches are flat arrays, the same with both backends"
+    edges = [(1, 2), (2, 3), (2, 4), (4, 5), (4, 6), (4, 7)]
+    node_table = pd.DataFrame(
+        {
+            "date_of_creation": ["2010-01-01", "2011-01-01", np.nan, "2012-01-01"] + [np.nan] * 3,
+            "sic_codes": ["['1']", "['2']", "['3']", "['4']", "['5']", "['6']", "['7']"],
+            "in_degree": [0, 1, 1, 1, 1, 1, 1],
+            "out_degree": [1, 2, 0, 3, 0, 0, 0],
+        },
+        index=range(1, 8),
+    )
+    for graph in [nx.DiGraph(edges), ArrayDiGraph.from_arrays(*np.array(edges).T)]:
+        set_node_table(graph, node_table)
+        dict_branches = get_dict_branches(graph, list(range(1, 8)))
+        detail_branches = dict_branches["detail_branches"]
+
+        assert dict_branches["branches"] == [2, 4]
+        assert detail_branches["branches"].tolist() == [2, 2, 4, 4, 4]
+        assert detail_branches["sprouts"].tolist() == [3, 4, 5, 6, 7]
+        assert detail_branches["growing_times_sprouts"][1] == 365 / 365.2425
+        assert np.isnan(detail_branches["growing_times_sprouts"][[0, 2, 3, 4]]).all()
+        assert detail_branches["sic_codes"].tolist() == [
+            "['3']",
+            "['4']",
+            "['5']",
+            "['6']",
+            "['7']",
+        ]
+
+
+def test_parallel_clusters():
+    "Testing the clusters analysed in shards on a process pool match the serial analysis"
+    graph = nx.DiGraph([(1, 2), (1, 3), (3, 4), (5, 6), (7, 8), (9, 8)])
+    node_table = pd.DataFrame(
+        {
+            "human": [True, False, False, False, True, False, True, False, True],
+            "in_degree": [0, 1, 1, 1, 0, 1, 0, 2, 0],
+            "out_degree": [2, 0, 1, 0, 1, 0, 1, 0, 1],
+            "date_of_creation": [np.nan, "2010-01-01", "2012-06-30", np.nan] + [np.nan] * 5,
+            "sic_codes": [np.nan] * 9,
+        },
+        index=range(1, 10),
+    )
+    set_node_table(graph, node_table)
+    components = get_components(*np.array(list(graph.edges)).T)
+
+    dict_cluster = get_dict_clusters(graph, components)
+    dict_cluster_parallel = get_dict_clusters(graph, components, n_workers=2, shard_size=2)
+
+    assert list(dict_cluster_parallel) == list(dict_cluster)
+    for k, cluster in dict_cluster.items():
+        assert cluster["list_of_nodes"] == dict_cluster_parallel[k]["list_of_nodes"]
+        assert cluster["class_str"] == dict_cluster_parallel[k]["class_str"]
+        assert cluster["max_length"] == dict_cluster_parallel[k]["max_length"]
+
+
+def test_small_clusters():
+    "Testing the small clusters summarised in bulk match the detailed analysis"
+    graph = nx.DiGraph([(1, 2), (1, 3), (3, 4), (5, 6), (7, 8), (9, 8), (10, 11), (11, 10)])
+    graph.add_node(12)
+    node_table = pd.DataFrame(
+        {
+            "human": [True, False, False, False, True, False, True, False, True, True, True, False],
+            "in_degree": [0, 1, 1, 1, 0, 1, 0, 2, 0, 1, 1, 0],
+            "out_degree": [2, 0, 1, 0, 1, 0, 1, 0, 1, 1, 1, 0],
+            "date_of_creation": [np.nan] * 5 + ["2010-01-01", np.nan, "2012-06-30"] + [np.nan] * 4,
+            "sic_codes": [np.nan] * 12,
+        },
+        index=range(1, 13),
+    )
+    set_node_table(graph, node_table)
+    components = get_components(*np.array(list(graph.edges)).T, node_ids=np.arange(1, 13))
+
+    dict_cluster = get_dict_clusters(graph, components)
+    dict_cluster_detailed = get_dict_clusters(graph, components, max_small_size=0)
+
+    fields = ["number_of_nodes", "number_of_roots", "number_of_branches", "list_of_nodes"]
+    fields += ["max_length", "number_of_humans", "min_date_of_creation", "class_str"]
+    for k, cluster in dict_cluster_detailed.items():
+        for field in fields:
+            assert str(dict_cluster[k][field]) == str(cluster[field])
+
+
+def test_lazy_clusters():
+    "Testing the lazy clusters match the dictionaries of the clusters, with a bounded cache"
+    graph = nx.DiGraph([(1, 2), (2, 3), (3, 1), (3, 4), (5, 6), (7, 8), (9, 8)])
+    node_table = pd.DataFrame(
+        {
+            "human": [False, False, False, False, True, False, True, False, True],
+            "in_degree": [1, 1, 1, 1, 0, 1, 0, 2, 0],
+            "out_degree": [1, 1, 2, 0, 1, 0, 1, 0, 1],
+            "date_of_creation": [np.nan, "2010-01-01", "2012-06-30"] + [np.nan] * 6,
+            "sic_codes": [np.nan] * 9,
+        },
+        index=range(1, 10),
+    )
+    set_node_table(graph, node_table)
+    components = get_components(*np.array(list(graph.edges)).T)
+
+    dict_cluster = get_dict_clusters(graph, components)
+    lazy_clusters = LazyClusters(graph, components, max_cached=2)
+
+    assert list(lazy_clusters) == list(dict_cluster)
+    for k, cluster in dict_cluster.items():
+        assert list(lazy_clusters[k]) == list(cluster)
+        for field in ["number_of_roots", "list_of_nodes", "max_length", "min_date_of_creation"]:
+            assert str(lazy_clusters[k][field]) == str(cluster[field])
+        assert lazy_clusters[k]["class_str"] == cluster["class_str"]
+        assert lazy_clusters[k]["dict_branches"]["branches"] == cluster["dict_branches"]["branches"]
+    assert len(lazy_clusters.cache) == 2